@@ -2,6 +2,8 @@
 Premium AI Text Display Helper
 Makes all AI-generated text bright, visible, and attractive
 """
+import time
+
 import streamlit as st
 
 def display_ai_response(text, title=None):
@@ -42,3 +44,38 @@ def display_ai_list(items, title=None):
     html += '</ul></div>'
     
     st.markdown(html, unsafe_allow_html=True)
+
+
+def stream_to_placeholder(placeholder, chunks, render=None, min_interval=0.05):
+    """
+    Render a token stream incrementally into a Streamlit placeholder.
+
+    Args:
+        placeholder: An st.empty() placeholder to draw into.
+        chunks: Iterable of text pieces (e.g. from llm_cache.stream_completion).
+        render: Optional function mapping the partial text to HTML. Defaults to plain markdown.
+        min_interval: Minimum seconds between redraws, so long streams do not flood the frontend.
+
+    Returns:
+        str: The full streamed text.
+    """
+    parts = []
+    last_draw = 0.0
+
+    def draw(text, cursor):
+        shown = text + cursor
+        if render:
+            placeholder.markdown(render(shown), unsafe_allow_html=True)
+        else:
+            placeholder.markdown(shown)
+
+    for piece in chunks:
+        parts.append(piece)
+        now = time.monotonic()
+        if now - last_draw >= min_interval:
+            draw("".join(parts), "▌")
+            last_draw = now
+
+    text = "".join(parts)
+    draw(text, "")
+    return text
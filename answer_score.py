@@ -1,12 +1,265 @@
 import streamlit as st
+import csv
+import io
+import logging
 import os
-from dotenv import load_dotenv
-from groq import Groq
-import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from groq_client import get_groq_client
+from llm_cache import cached_completion
+from structured_output import loads_lenient, structured_completion
+from text_utils import count_tokens
+
+logger = logging.getLogger("coach.answer_score")
+
+SCORE_MODEL = "llama-3.1-8b-instant"
+# Prompt tokens per batched request (items are packed greedily under this budget)
+ANSWER_BATCH_TOKENS = int(os.getenv("ANSWER_BATCH_TOKENS", "2500"))
+# Cap on items per request, so the JSON reply stays well inside the completion limit
+ANSWER_BATCH_MAX_ITEMS = int(os.getenv("ANSWER_BATCH_MAX_ITEMS", "6"))
+ANSWER_SCORE_WORKERS = int(os.getenv("ANSWER_SCORE_WORKERS", "4"))
+ANSWER_SCORE_RETRIES = int(os.getenv("ANSWER_SCORE_RETRIES", "2"))
+ITEM_OVERHEAD_TOKENS = 20
+
+BATCH_SYSTEM_PROMPT = (
+    "You are an expert Interview Coach. Evaluate each candidate answer for the role and question given. "
+    "Return valid JSON only, shaped as {\"results\": [{\"id\": <item id>, \"score\": <0-100 integer>, "
+    "\"feedback\": <string>, \"better_answer\": <string>}]}, with exactly one entry per item id."
+)
+
+ANSWER_SCHEMA = {
+    "type": "object",
+    "required": ["score", "feedback"],
+    "properties": {
+        "score": {"type": "integer", "minimum": 0, "maximum": 100},
+        "feedback": {"type": "string", "minLength": 1},
+        "better_answer": {"type": "string"},
+    },
+}
+
+
+def items_from_session(questions, answers, role):
+    """
+    Build scoring items from the JD mock interview's questions and answers. Questions
+    without an answer (an interview ended early) are kept with an empty answer, so they
+    are scored as skipped.
+    """
+    answers = list(answers) + [""] * (len(questions) - len(answers))
+    return [
+        {"question": q, "answer": a, "role": role}
+        for q, a in zip(questions, answers)
+    ]
+
+
+def items_from_csv(data, default_role="General"):
+    """
+    Parse scoring items from CSV bytes with columns question, answer and optional role
+    (header names are case-insensitive).
+    """
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig", errors="ignore")))
+    items = []
+    for row in reader:
+        row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+        if row.get("question") or row.get("answer"):
+            items.append({
+                "question": row.get("question", ""),
+                "answer": row.get("answer", ""),
+                "role": row.get("role") or default_role,
+            })
+    return items
+
+
+def _item_tokens(item):
+    return count_tokens(item["question"]) + count_tokens(item["answer"]) + ITEM_OVERHEAD_TOKENS
+
+
+def pack_items(indices, items, budget=ANSWER_BATCH_TOKENS, max_items=ANSWER_BATCH_MAX_ITEMS):
+    """Group item indices into batches under a prompt-token budget (an oversized item gets its own batch)."""
+    budget -= count_tokens(BATCH_SYSTEM_PROMPT)
+    batches = [[]]
+    used = 0
+    for index in indices:
+        tokens = _item_tokens(items[index])
+        if batches[-1] and (used + tokens > budget or len(batches[-1]) >= max_items):
+            batches.append([])
+            used = 0
+        batches[-1].append(index)
+        used += tokens
+    return [batch for batch in batches if batch]
+
+
+def _batch_messages(indices, items):
+    blocks = [
+        f"Item {i}\nRole: {items[i]['role']}\nQuestion: {items[i]['question']}\nAnswer: {items[i]['answer']}"
+        for i in indices
+    ]
+    return [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Item ids: {', '.join(str(i) for i in indices)}\n\n" + "\n\n".join(blocks)},
+    ]
+
+
+def parse_batch_results(text, indices):
+    """
+    Validate a batched reply (near-valid JSON is repaired locally first).
+
+    Returns:
+        dict: item id -> {"score", "feedback", "better_answer"} for every well-formed
+            entry whose id was requested; malformed or missing items are left out.
+    """
+    try:
+        data = loads_lenient(text)
+    except ValueError:
+        return {}
+    entries = data.get("results") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        return {}
+    wanted = set(indices)
+    results = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            item_id = int(entry.get("id"))
+            score = int(round(float(entry.get("score"))))
+        except (TypeError, ValueError):
+            continue
+        feedback = entry.get("feedback")
+        if item_id not in wanted or not 0 <= score <= 100 or not isinstance(feedback, str) or not feedback.strip():
+            continue
+        better = entry.get("better_answer")
+        results[item_id] = {"score": score, "feedback": feedback, "better_answer": better if isinstance(better, str) else ""}
+    return results
+
+
+def score_answers(client, items, on_result=None, max_workers=ANSWER_SCORE_WORKERS, retries=ANSWER_SCORE_RETRIES):
+    """
+    Score many (question, answer, role) items with packed, concurrent requests.
+
+    Items are packed several per request under ANSWER_BATCH_TOKENS and the requests run
+    concurrently. Each reply must be a JSON array with one entry per item; items missing
+    or malformed in a reply are re-packed and retried (uncached) up to `retries` times.
+    Empty answers are scored 0 locally.
+
+    Args:
+        client (Groq): The Groq client.
+        items (list): {"question", "answer", "role"} dicts.
+        on_result (callable): on_result(index, result) as each item completes, on the calling thread.
+        max_workers (int): Concurrent requests.
+        retries (int): Extra attempts for items that failed to parse.
+
+    Returns:
+        list: One {"score", "feedback", "better_answer"} dict per item, or None if it
+            still failed after all retries.
+    """
+    results = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        if item["answer"].strip():
+            pending.append(index)
+        else:
+            results[index] = {"score": 0, "feedback": "Skipped - no answer given.", "better_answer": ""}
+            if on_result is not None:
+                on_result(index, results[index])
+
+    def run(batch, attempt):
+        reply = cached_completion(
+            client,
+            model=SCORE_MODEL,
+            messages=_batch_messages(batch, items),
+            response_format={"type": "json_object"},
+            use_cache=attempt == 0,
+            lane="batch",
+            # Cache only complete replies, so a bad one is not replayed on the next try
+            accept=lambda text: set(parse_batch_results(text, batch)) == set(batch),
+        )
+        return parse_batch_results(reply, batch)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for attempt in range(retries + 1):
+            if not pending:
+                break
+            futures = {pool.submit(run, batch, attempt): batch for batch in pack_items(pending, items)}
+            failed = []
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    parsed = future.result()
+                except Exception as e:
+                    logger.warning("Answer scoring request failed: %s", e)
+                    parsed = {}
+                for index in batch:
+                    if index in parsed:
+                        results[index] = parsed[index]
+                        if on_result is not None:
+                            on_result(index, parsed[index])
+                    else:
+                        failed.append(index)
+            if failed and attempt < retries:
+                logger.info("Retrying %d of %d answer(s) that failed to parse", len(failed), len(items))
+            pending = sorted(failed)
+    return results
+
+
+ROLES = ["Software Developer", "Data Analyst", "ML Engineer", "HR Interview", "Product Manager", "General"]
+
+
+def show_batch_scoring(client):
+    """Score a whole practice session: the JD mock interview's answers or a CSV upload."""
+    has_interview = bool(st.session_state.get("questions"))
+    sources = (["JD Mock Interview"] if has_interview else []) + ["CSV Upload"]
+    source = st.radio("Answers from", sources, horizontal=True)
+    role = st.selectbox("Target Role", ROLES, help="Used for items without a role column")
+
+    items = []
+    if source == "JD Mock Interview":
+        items = items_from_session(st.session_state.questions, st.session_state.answers, role)
+        answered = sum(1 for item in items if item["answer"].strip())
+        st.caption(f"{answered} of {len(items)} question(s) answered in your last mock interview")
+    else:
+        upload = st.file_uploader("Upload CSV (columns: question, answer, role)", type=["csv"])
+        if upload is not None:
+            items = items_from_csv(upload.getvalue(), default_role=role)
+            st.caption(f"{len(items)} item(s) found")
+
+    if st.button("SCORE ALL ANSWERS", use_container_width=True):
+        if not client:
+            st.error("Groq API Key not found! Please check .env file.")
+        elif not items:
+            st.warning("No answers to score.")
+        else:
+            progress = st.progress(0.0, text="Scoring answers...")
+            done = []
+
+            def report(index, result):
+                done.append(index)
+                progress.progress(len(done) / len(items), text=f"Scored {len(done)} of {len(items)}")
+
+            results = score_answers(client, items, on_result=report)
+            st.session_state.batch_score_results = list(zip(items, results))
+
+    scored = st.session_state.get("batch_score_results")
+    if scored:
+        valid = [r["score"] for _, r in scored if r is not None]
+        if valid:
+            st.markdown(f"#### Average Score: {sum(valid) / len(valid):.0f}%")
+        failed = sum(1 for _, r in scored if r is None)
+        if failed:
+            st.warning(f"{failed} item(s) could not be scored. Try again to retry them.")
+        st.dataframe(
+            [
+                {"#": i, "question": item["question"], "score": r["score"] if r else None, "feedback": r["feedback"] if r else "not scored"}
+                for i, (item, r) in enumerate(scored, 1)
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+        for i, (item, r) in enumerate(scored, 1):
+            if r and r["better_answer"]:
+                with st.expander(f"✨ Suggested answer for Q{i}"):
+                    st.write(r["better_answer"])
+
 
 def show_answer_score():
-    load_dotenv()
-    
     # Page configuration
     st.set_page_config(page_title="Precision Scorer - Deep Cosmos", page_icon="🎯", layout="wide")
 
@@ -18,13 +271,11 @@ def show_answer_score():
         pass
 
     # Initialize Groq Client
-    GROQ_API_KEY = os.getenv("GROQ_API_KEY")
     client = None
-    if GROQ_API_KEY:
-        try:
-            client = Groq(api_key=GROQ_API_KEY)
-        except Exception as e:
-            st.error(f"Error initializing Groq client: {e}")
+    try:
+        client = get_groq_client()
+    except Exception as e:
+        st.error(f"Error initializing Groq client: {e}")
 
     # ---------------- HEADER ----------------
     col_head1, col_head2 = st.columns([8, 2])
@@ -77,9 +328,15 @@ def show_answer_score():
     </style>
     """, unsafe_allow_html=True)
     
+    score_mode = st.radio("Mode", ["Single Answer", "Full Transcript"], horizontal=True, label_visibility="collapsed")
+    if score_mode == "Full Transcript":
+        show_batch_scoring(client)
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
+
     role = st.selectbox(
         "Target Role",
-        ["Software Developer", "Data Analyst", "ML Engineer", "HR Interview", "Product Manager", "General"]
+        ROLES
     )
 
     answer = st.text_area("Provide your answer for analysis:", height=250, placeholder="Type or paste the answer you gave during practice...")
@@ -92,7 +349,8 @@ def show_answer_score():
         else:
             with st.spinner("AI Evaluating..."):
                 try:
-                    completion = client.chat.completions.create(
+                    result = structured_completion(
+                        client,
                         messages=[
                             {
                                 "role": "system", 
@@ -104,12 +362,10 @@ def show_answer_score():
                             }
                         ],
                         model="llama-3.1-8b-instant",
-                        response_format={"type": "json_object"}
+                        schema=ANSWER_SCHEMA,
                     )
-                    
-                    result = json.loads(completion.choices[0].message.content)
-                    score = result.get('score', 0)
-                    feedback = result.get('feedback', "No feedback provided.")
+                    score = result['score']
+                    feedback = result['feedback']
                     better_answer = result.get('better_answer', "")
 
                     st.success("Analysis Optimized")
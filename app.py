@@ -1,11 +1,57 @@
+import importlib
+import logging
+import os
+import sys
+import time
+
 import streamlit as st
-from landing_page import show_landing
-from general_chat import show_chat
-from ocr_jd import show_jd_interview
-from resume_suggestion import show_resume_suggestion
-from ats import show_ats_score
-from answer_score import show_answer_score
 
+logging.basicConfig(
+    level=os.getenv("COACH_LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger("coach.app")
+
+# Page registry: page key -> (module path, entry function).
+# Page modules pull in heavy dependencies (groq, pytesseract, PIL, speech_recognition, fitz),
+# so each one is imported only the first time its page is routed to.
+PAGES = {
+    "landing": ("landing_page", "show_landing"),
+    "chat": ("general_chat", "show_chat"),
+    "jd": ("ocr_jd", "show_jd_interview"),
+    "resume": ("resume_suggestion", "show_resume_suggestion"),
+    "ats": ("ats", "show_ats_score"),
+    "score": ("answer_score", "show_answer_score"),
+}
+
+# Import cost per module (seconds), measured on first load in this process
+PAGE_IMPORT_TIMES = {}
+
+
+def load_page(page):
+    """
+    Resolve a page key to its entry function, importing the page module on first use.
+
+    Args:
+        page (str): The page key from st.session_state.page.
+
+    Returns:
+        callable or None: The page's show_* function, or None for unknown pages.
+    """
+    entry = PAGES.get(page)
+    if entry is None:
+        return None
+    module_path, func_name = entry
+
+    module = sys.modules.get(module_path)
+    if module is None:
+        start = time.perf_counter()
+        module = importlib.import_module(module_path)
+        elapsed = time.perf_counter() - start
+        PAGE_IMPORT_TIMES[module_path] = elapsed
+        logger.info("Imported page module %s for '%s' in %.1f ms", module_path, page, elapsed * 1000)
+
+    return getattr(module, func_name)
 
 
 # Initialize session state
@@ -18,23 +64,9 @@ if "page" in params:
     st.session_state.page = params["page"]
 
 # Navigation Logic
-if st.session_state.page == "chat":
-    show_chat()
-
-elif st.session_state.page == "landing":
-    show_landing()
-
-elif st.session_state.page == "jd":
-    show_jd_interview()
-
-elif st.session_state.page == "resume":
-    show_resume_suggestion()
-
-elif st.session_state.page == "ats":
-    show_ats_score()
-
-elif st.session_state.page == "score":
-    show_answer_score()
+show_page = load_page(st.session_state.page)
+if show_page is not None:
+    show_page()
 
 else:
     st.write(f"Page {st.session_state.page} is coming soon!")
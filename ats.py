@@ -1,19 +1,426 @@
 import streamlit as st
-import os
-from dotenv import load_dotenv
-from groq import Groq
-import json
-from io import BytesIO
-
-# Fallback for PyPDF2
-try:
-    import PyPDF2
-except ImportError:
-    PyPDF2 = None
+import re
+import time
+from collections import Counter, namedtuple
+from functools import lru_cache
+from groq_client import get_groq_client
+from map_reduce import analyze_document
+from structured_output import is_valid, parse_or_repair, StructuredOutputError
+from doc_cache import get_document
+from doc_extract import extract_document
+
+# ---------------- LOCAL KEYWORD MATCHER ----------------
+# Canonical skill -> aliases. Matching is done on normalised tokens, so aliases are
+# written lower-case and may span several words.
+SKILL_VOCABULARY = {
+    "python": ["python3"],
+    "java": [],
+    "javascript": ["js", "ecmascript", "es6"],
+    "typescript": [],
+    "c++": ["cpp"],
+    "c#": ["csharp", "c sharp"],
+    "go": ["golang"],
+    "rust": [],
+    "ruby": [],
+    "php": [],
+    "scala": [],
+    "kotlin": [],
+    "swift": [],
+    "r": [],
+    "sql": ["structured query language"],
+    "nosql": ["no sql"],
+    "postgresql": ["postgres", "psql"],
+    "mysql": [],
+    "mongodb": ["mongo"],
+    "redis": [],
+    "elasticsearch": ["elastic search", "opensearch"],
+    "kafka": ["apache kafka"],
+    "spark": ["apache spark", "pyspark"],
+    "hadoop": [],
+    "airflow": ["apache airflow"],
+    "dbt": [],
+    "snowflake": [],
+    "react": ["reactjs", "react.js"],
+    "angular": ["angularjs"],
+    "vue": ["vuejs", "vue.js"],
+    "node.js": ["nodejs"],
+    "django": [],
+    "flask": [],
+    "fastapi": [],
+    "spring": ["spring boot", "springboot"],
+    "graphql": [],
+    "rest api": ["rest", "restful", "rest apis", "restful api", "restful apis"],
+    "microservices": ["microservice", "micro services"],
+    "docker": ["containerization"],
+    "kubernetes": ["k8s"],
+    "terraform": [],
+    "ansible": [],
+    "aws": ["amazon web services"],
+    "azure": ["microsoft azure"],
+    "gcp": ["google cloud", "google cloud platform"],
+    "linux": ["unix"],
+    "git": ["github", "gitlab", "version control"],
+    "ci/cd": ["cicd", "ci cd", "continuous integration", "continuous delivery", "continuous deployment"],
+    "machine learning": ["ml"],
+    "deep learning": [],
+    "artificial intelligence": ["ai"],
+    "natural language processing": ["nlp"],
+    "computer vision": [],
+    "large language models": ["llm", "llms"],
+    "pytorch": ["torch"],
+    "tensorflow": [],
+    "scikit-learn": ["sklearn", "scikit learn"],
+    "pandas": [],
+    "numpy": [],
+    "data analysis": ["data analytics"],
+    "data visualization": ["data visualisation"],
+    "tableau": [],
+    "power bi": ["powerbi"],
+    "excel": ["microsoft excel", "ms excel"],
+    "statistics": ["statistical analysis"],
+    "etl": ["elt", "data pipelines", "data pipeline"],
+    "unit testing": ["unit tests", "pytest", "junit"],
+    "agile": ["scrum", "kanban"],
+    "project management": [],
+    "communication": ["communication skills"],
+    "leadership": ["team lead", "leading teams"],
+    "problem solving": ["problem-solving"],
+    "html": ["html5"],
+    "css": ["css3"],
+    "figma": [],
+    "security": ["cybersecurity", "cyber security"],
+}
+
+# Names that are also ordinary words ("go the extra mile", "R&D", "the rest of the team")
+# only count in their usual spelling: acronyms in upper case, and languages also only
+# inside a list of skills ("Python, Go and R").
+CASED_NAMES = {"ai": "AI", "ml": "ML", "rest": "REST", "go": "Go", "r": "R"}
+LIST_ONLY_NAMES = {"go", "r"}
+_LIST_GAP_RE = re.compile(r"^[\s,/;|&():]*$")
+_CONJUNCTIONS = {"and", "or"}
+
+STOPWORDS = set("""
+a about above after again all also an and any are as at be been being below between both but by can
+could did do does doing down during each etc few for from further had has have having he her here hers
+him his how i if in into is it its itself just me more most must my no nor not of off on once only or
+other our ours out over own per plus same she should so some such than that the their them then there
+these they this those through to too under until up us very via was we well were what when where which
+while who whom why will with within without would you your yours
+able ability across along candidate candidates company develop developing including join looking new
+preferred position required requirement requirements responsibilities responsible role skills strong
+team teams use using work working year years experience experienced knowledge understanding good great
+excellent plus ideal opportunity environment related least minimum degree need needs seeking hiring
+want wants nice like must etc apply send visit welcome resume cv email contact
+""".split())
+
+# Tokens keep characters that matter in tech names: c++, c#, node.js, ci/cd, scikit-learn
+_ATS_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#./-]*[a-z0-9+#]|[a-z0-9]", re.IGNORECASE)
+# Contact details and links are not keywords
+_CONTACT_RE = re.compile(
+    r"\S+@\S+\.\w+|(?:https?://|www\.)\S+|\b[\w-]+(?:\.[\w-]+)*\.(?:com|org|io|dev|co|edu|gov|in|uk)\b(?:/\S*)?",
+    re.IGNORECASE,
+)
+
+KeywordMatch = namedtuple("KeywordMatch", ["score", "matched", "missing", "skills_found", "skills_total", "seconds"])
+
+
+def _token_spans(text):
+    # (lower-case tokens, tokens as written, text between each token and the previous one)
+    text = _CONTACT_RE.sub(" ", text)
+    tokens, raw, gaps = [], [], []
+    end = 0
+    for match in _ATS_TOKEN_RE.finditer(text):
+        tokens.append(match.group().lower())
+        raw.append(match.group())
+        gaps.append(text[end:match.start()])
+        end = match.end()
+    return tokens, raw, gaps
+
+
+def tokenize(text):
+    """Lower-case text and split it into tech-aware tokens (emails and URLs are dropped)."""
+    return _token_spans(text)[0]
+
+
+def _stem(token):
+    # Crude suffix stripping so "deploying"/"deployed"/"deployments" meet "deploy"
+    for suffix in ("ments", "ment", "ings", "ing", "ies", "ed", "es", "s"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            return token[: -len(suffix)]
+    return token
+
+
+def _build_alias_index(vocabulary):
+    # Token tuple of every canonical name and alias -> canonical skill
+    index = {}
+    for canonical, aliases in vocabulary.items():
+        for name in [canonical] + aliases:
+            index[tuple(tokenize(name))] = canonical
+    return index, max(len(key) for key in index)
+
+
+_ALIAS_INDEX, _MAX_ALIAS_WORDS = _build_alias_index(SKILL_VOCABULARY)
+
+
+def _list_neighbour(i, step, tokens, gaps):
+    # Is the next token in direction `step` a vocabulary name, joined only by list
+    # punctuation and at most one "and"/"or"?
+    j = i + step
+    if 0 <= j < len(tokens) and tokens[j] in _CONJUNCTIONS:
+        if not _LIST_GAP_RE.match(gaps[max(i, j)]):
+            return False
+        j += step
+    if not 0 <= j < len(tokens) or (tokens[j],) not in _ALIAS_INDEX:
+        return False
+    return bool(_LIST_GAP_RE.match(gaps[max(j, j - step)]))
+
+
+def _in_skill_list(i, tokens, gaps):
+    return _list_neighbour(i, -1, tokens, gaps) or _list_neighbour(i, 1, tokens, gaps)
+
+
+def _accept_name(i, tokens, raw, gaps):
+    name = tokens[i]
+    if name not in CASED_NAMES:
+        return True
+    if raw[i] != CASED_NAMES[name]:
+        return False
+    return name not in LIST_ONLY_NAMES or _in_skill_list(i, tokens, gaps)
+
+
+def _scan_skills(tokens, raw, gaps):
+    # (canonical skills, positions of the tokens that named them); longest alias wins
+    found = set()
+    consumed = set()
+    i = 0
+    while i < len(tokens):
+        for n in range(min(_MAX_ALIAS_WORDS, len(tokens) - i), 0, -1):
+            skill = _ALIAS_INDEX.get(tuple(tokens[i:i + n]))
+            if skill is not None and (n > 1 or _accept_name(i, tokens, raw, gaps)):
+                found.add(skill)
+                consumed.update(range(i, i + n))
+                i += n
+                break
+        else:
+            i += 1
+    return found, consumed
+
+
+def find_skills(text):
+    """Return the canonical skills mentioned in a text."""
+    return _scan_skills(*_token_spans(text))[0]
+
+
+def _is_keyword(token):
+    return len(token) > 2 and token not in STOPWORDS and not token.isdigit()
+
+
+def extract_jd_keywords(jd_text, max_keywords=25):
+    """
+    Pull the terms a resume is screened for out of a job description.
+
+    Returns:
+        tuple: (skills, keywords) - canonical vocabulary skills, and other frequent
+            unigrams/bigrams (stop words and skill mentions removed), most frequent first.
+    """
+    tokens, raw, gaps = _token_spans(jd_text)
+    skills, consumed = _scan_skills(tokens, raw, gaps)
+    # Drop skill mentions so "rest apis" does not also yield the keyword "apis"
+    words = [t if i not in consumed else None for i, t in enumerate(tokens)]
+
+    unigrams = Counter(t for t in words if t and _is_keyword(t))
+    bigrams = Counter(
+        f"{a} {b}" for a, b in zip(words, words[1:])
+        if a and b and _is_keyword(a) and _is_keyword(b)
+    )
+    # Repeated bigrams rank ahead of unigrams with the same count
+    ranked = [(term, n, 2) for term, n in bigrams.items() if n >= 2] + [(term, n, 1) for term, n in unigrams.items()]
+    ranked.sort(key=lambda item: (-item[1], -item[2], item[0]))
+
+    keywords = []
+    covered = set()
+    for term, _, _ in ranked:
+        stems = {_stem(word) for word in term.split()}
+        # Skip unigrams already covered by a chosen term (including other inflections)
+        if len(stems) == 1 and stems <= covered:
+            continue
+        keywords.append(term)
+        covered.update(stems)
+        if len(keywords) >= max_keywords:
+            break
+    return skills, keywords
+
+
+ResumeIndex = namedtuple("ResumeIndex", ["skills", "stems", "bigrams"])
+
+
+@lru_cache(maxsize=64)
+def build_resume_index(resume_text):
+    """Precompute the lookup sets used to match JD terms against a resume."""
+    tokens, raw, gaps = _token_spans(resume_text)
+    stems = [_stem(t) for t in tokens]
+    return ResumeIndex(
+        skills=frozenset(_scan_skills(tokens, raw, gaps)[0]),
+        stems=frozenset(stems),
+        bigrams=frozenset(zip(stems, stems[1:])),
+    )
+
+
+JDTerm = namedtuple("JDTerm", ["term", "is_skill", "weight"])
+
+
+def jd_terms(jd_text, skill_weight=2.0):
+    """
+    The weighted terms a resume is scored on: vocabulary skills (skill_weight each)
+    followed by other JD keywords (weight 1).
+    """
+    skills, keywords = extract_jd_keywords(jd_text)
+    return [JDTerm(skill, True, skill_weight) for skill in sorted(skills)] + [JDTerm(term, False, 1.0) for term in keywords]
+
+
+def term_requirements(term):
+    """
+    What a resume index must contain to match a JDTerm, as (field, key) pairs naming
+    a ResumeIndex field and a member of it: the skill, the word's stem, or every
+    adjacent stem pair of a phrase.
+    """
+    if term.is_skill:
+        return [("skills", term.term)]
+    stems = tuple(_stem(t) for t in term.term.split())
+    if len(stems) == 1:
+        return [("stems", stems[0])]
+    return [("bigrams", pair) for pair in zip(stems, stems[1:])]
+
+
+def has_term(index, term):
+    """True if a resume index contains a JDTerm."""
+    return all(key in getattr(index, field) for field, key in term_requirements(term))
+
+
+def local_ats_score(resume_text, jd_text, skill_weight=2.0):
+    """
+    Score keyword coverage of a resume against a JD, without an LLM.
+
+    Vocabulary skills count skill_weight each, other JD keywords count 1.
+
+    Returns:
+        KeywordMatch: score (0-100), matched and missing terms, skill counts, seconds taken.
+    """
+    start = time.perf_counter()
+    terms = jd_terms(jd_text, skill_weight)
+    index = build_resume_index(resume_text)
+
+    matched, missing = [], []
+    earned = possible = 0.0
+    for term in terms:
+        possible += term.weight
+        if has_term(index, term):
+            earned += term.weight
+            matched.append(term.term)
+        else:
+            missing.append(term.term)
+
+    score = round(100 * earned / possible) if possible else 0
+    skills_found = sum(1 for term in terms if term.is_skill and term.term in index.skills)
+    skills_total = sum(1 for term in terms if term.is_skill)
+    return KeywordMatch(score, matched, missing, skills_found, skills_total, time.perf_counter() - start)
+
+
+ATS_SYSTEM_PROMPT = "You are an expert ATS System. Compare the candidate's resume with the provided Job Description. Return valid JSON only with keys: 'match_score' (0-100 integer) and 'analysis' (markdown string)."
+ATS_SCHEMA = {
+    "type": "object",
+    "required": ["match_score", "analysis"],
+    "properties": {
+        "match_score": {"type": "integer", "minimum": 0, "maximum": 100},
+        "analysis": {"type": "string", "minLength": 1},
+    },
+}
+
+
+def llm_ats_analysis(client, resume_text, jd_text, match=None, lane="default"):
+    """
+    Ask the LLM for a match score and written analysis (the optional second stage).
+
+    Args:
+        client (Groq): The Groq client.
+        resume_text (str): Resume text; long resumes are analysed in parts, then merged.
+        jd_text (str): Job description.
+        match (KeywordMatch): Local keyword result to ground the analysis, if available.
+        lane (str): Scheduler priority lane ("batch" for batch ranking).
+
+    Returns:
+        tuple: (match_score or None if no valid reply could be recovered, analysis text)
+    """
+    keyword_note = ""
+    if match is not None:
+        keyword_note = (
+            f"\n\nKEYWORD SCAN: matched {', '.join(match.matched) or 'none'}; "
+            f"missing {', '.join(match.missing) or 'none'}."
+        )
+    result_text = analyze_document(
+        client,
+        model="llama-3.1-8b-instant",
+        system_prompt=ATS_SYSTEM_PROMPT,
+        build_prompt=lambda resume: f"RESUME:\n{resume}\n\nJOB DESCRIPTION:\n{jd_text}{keyword_note}",
+        text=resume_text,
+        reduce_note="Return valid JSON only with keys 'match_score' (0-100 integer, for the whole resume) and 'analysis' (markdown string).",
+        response_format={"type": "json_object"},
+        lane=lane,
+        accept=lambda text: is_valid(text, ATS_SCHEMA),
+    )
+    try:
+        result = parse_or_repair(client, "llama-3.1-8b-instant", result_text, ATS_SCHEMA)
+    except StructuredOutputError:
+        return None, result_text
+    return result["match_score"], result["analysis"]
+
+
+def show_batch_ranking(client):
+    """Rank many resumes (files or .zip archives) against one JD."""
+    from ats_batch import BATCH_TOP_K, TABLE_COLUMNS, iter_batch
+
+    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+    st.markdown('### <span class="material-symbols-rounded" style="vertical-align: middle; margin-right: 8px; color: var(--nebula-pink);">leaderboard</span> Batch Ranking', unsafe_allow_html=True)
+
+    uploads = st.file_uploader("Upload Resumes (files or .zip)", type=["pdf", "docx", "doc", "txt", "zip"], accept_multiple_files=True)
+    job_role = st.text_area("Target Job Description", height=200, placeholder="Paste JD here to rank resumes against...", key="batch_jd")
+    top_k = st.number_input("AI analysis for the top", min_value=0, max_value=100, value=BATCH_TOP_K,
+                            help="Only the best keyword matches are sent to the LLM; 0 ranks by keywords only")
+
+    status = st.empty()
+    table = st.empty()
+    if st.button("RANK RESUMES", use_container_width=True):
+        if not uploads:
+            st.warning("Please upload at least one resume.")
+        elif not job_role:
+            st.warning("Please paste a Job Description.")
+        else:
+            if top_k and not client:
+                st.info("Groq API Key not found - ranking by keyword coverage only.")
+            files = [(f.name, f.getvalue()) for f in uploads]
+            rows = []
+            try:
+                for message, snapshot in iter_batch(files, job_role, client if top_k else None, top_k=int(top_k)):
+                    status.caption(message)
+                    if snapshot:
+                        rows = snapshot
+                        table.dataframe([{c: r[c] for c in TABLE_COLUMNS} for r in rows], use_container_width=True, hide_index=True)
+            except Exception as e:
+                st.error(f"Error during batch scan: {str(e)}")
+            st.session_state.ats_batch_rows = rows
+
+    rows = st.session_state.get("ats_batch_rows")
+    if rows:
+        table.dataframe([{c: r[c] for c in TABLE_COLUMNS} for r in rows], use_container_width=True, hide_index=True)
+        for row in rows:
+            if row["analysis"]:
+                with st.expander(f"#{row['rank']} {row['file']} - AI score {row['ai_score']}"):
+                    st.markdown(row["analysis"])
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
 
 def show_ats_score():
-    load_dotenv()
-    
     # Page configuration
     st.set_page_config(page_title="ATS Cosmic Scanner - Deep Cosmos", page_icon="🔍", layout="wide")
 
@@ -22,13 +429,11 @@ def show_ats_score():
         st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
     # Initialize Groq Client
-    GROQ_API_KEY = os.getenv("GROQ_API_KEY")
     client = None
-    if GROQ_API_KEY:
-        try:
-            client = Groq(api_key=GROQ_API_KEY)
-        except Exception as e:
-            st.error(f"Error initializing Groq client: {e}")
+    try:
+        client = get_groq_client()
+    except Exception as e:
+        st.error(f"Error initializing Groq client: {e}")
 
     # ---------------- HEADER ----------------
     col_head1, col_head2 = st.columns([8, 2])
@@ -52,6 +457,11 @@ def show_ats_score():
             st.rerun()
 
     # ---------------- MAIN CONTENT ----------------
+    scan_mode = st.radio("Mode", ["Single Resume", "Batch Ranking"], horizontal=True, label_visibility="collapsed")
+    if scan_mode == "Batch Ranking":
+        show_batch_ranking(client)
+        return
+
     col_left, col_right = st.columns([6, 4])
 
     with col_left:
@@ -106,58 +516,49 @@ def show_ats_score():
         </style>
         """, unsafe_allow_html=True)
         
-        uploaded_file = st.file_uploader("Upload Document", type=["pdf"])
+        uploaded_file = st.file_uploader("Upload Document", type=["pdf", "docx", "doc", "txt"])
         job_role = st.text_area("Target Job Description", height=200, placeholder="Paste JD here to calibrate scores...")
         
         if st.button("EXECUTE ATS AUDIT", use_container_width=True):
-            if not client:
-                st.error("Groq API Key not found!")
-            elif not PyPDF2:
-                 st.error("PyPDF2 library is missing. Cannot process PDF. Please install PyPDF2.")
-            elif not uploaded_file:
+            if not uploaded_file:
                 st.warning("Please upload a resume first.")
             elif not job_role:
                 st.warning("Please paste a Job Description.")
             else:
-                with st.spinner("Analyzing Compatibility..."):
+                with st.spinner("Scanning keywords..."):
                     try:
-                        # Extract Text from PDF
-                        pdf_reader = PyPDF2.PdfReader(uploaded_file)
-                        resume_text = ""
-                        for page in pdf_reader.pages:
-                            resume_text += page.extract_text()
-                        
-
-
-                        # Compare Resume vs JD using Groq
-                        completion = client.chat.completions.create(
-                            messages=[
-                                {"role": "system", "content": "You are an expert ATS System. Compare the candidate's resume with the provided Job Description. Return valid JSON only with keys: 'match_score' (0-100 integer) and 'analysis' (markdown string)."},
-                                {"role": "user", "content": f"RESUME:\n{resume_text}\n\nJOB DESCRIPTION:\n{job_role}"}
-                            ],
-                            model="llama-3.1-8b-instant",
-                            response_format={"type": "json_object"}
-                        )
-                        result_text = completion.choices[0].message.content
-                        
-                        # Extract Score and Analysis
-                        try:
-                            result_json = json.loads(result_text)
-                            score = result_json.get("match_score", 0)
-                            analysis_content = result_json.get("analysis", "No analysis provided.")
-                                
-                            st.session_state.ats_score = score
-                            st.session_state.ats_analysis = analysis_content
-                            st.success("ATS Scan Complete")
-                            
-                        except Exception as e:
-                            st.error(f"Error parsing score: {e}")
-                            st.session_state.ats_score = 0
-                            st.session_state.ats_analysis = result_text
-                            
+                        # Extract resume text (cached by file hash, shared with other pages)
+                        resume_text = get_document(uploaded_file.getvalue(), uploaded_file.name, extract_document)["text"]
+
+                        # Instant, deterministic keyword coverage; the AI narrative is a separate step
+                        match = local_ats_score(resume_text, job_role)
+                        st.session_state.ats_score = match.score
+                        st.session_state.ats_keywords = match
+                        st.session_state.ats_inputs = (resume_text, job_role)
+                        st.session_state.ats_analysis = ""
+                        st.session_state.pop("ats_llm_score", None)
+                        st.success(f"Keyword scan complete in {match.seconds * 1000:.0f} ms")
                     except Exception as e:
                         st.error(f"Error during scan: {str(e)}")
 
+        if st.session_state.get("ats_inputs"):
+            if st.button("✨ ADD AI NARRATIVE", use_container_width=True, help="Ask the LLM for a written analysis and its own score estimate"):
+                if not client:
+                    st.error("Groq API Key not found!")
+                else:
+                    resume_text, jd_text = st.session_state.ats_inputs
+                    with st.spinner("Analyzing Compatibility..."):
+                        try:
+                            score, analysis = llm_ats_analysis(client, resume_text, jd_text, st.session_state.ats_keywords)
+                            st.session_state.ats_analysis = analysis
+                            if score is None:
+                                st.error("Error parsing score: the model did not return valid JSON")
+                            else:
+                                st.session_state.ats_llm_score = score
+                                st.success("ATS Scan Complete")
+                        except Exception as e:
+                            st.error(f"Error during scan: {str(e)}")
+
         st.markdown("</div>", unsafe_allow_html=True)
 
     with col_right:
@@ -185,6 +586,18 @@ def show_ats_score():
             </div>
             <div style="font-weight: 600; color: {score_color}; margin-bottom: 2rem; font-size: 1.2rem;">{verdict}</div>
         """, unsafe_allow_html=True)
+
+        match = st.session_state.get("ats_keywords")
+        if match is not None:
+            st.caption(f"Keyword coverage · {match.skills_found}/{match.skills_total} core skills found")
+            if st.session_state.get("ats_llm_score") is not None:
+                st.caption(f"AI estimate: {st.session_state.ats_llm_score}%")
+            if match.missing:
+                chips = "".join(
+                    f'<span style="display: inline-block; margin: 3px; padding: 3px 10px; border-radius: 999px; background: rgba(239, 68, 68, 0.15); border: 1px solid rgba(239, 68, 68, 0.4); color: #FECACA; font-size: 0.85rem;">{term}</span>'
+                    for term in match.missing
+                )
+                st.markdown(f'<div style="text-align: left; margin-bottom: 1rem;"><div style="color: #E2E8F0; font-weight: 600; margin-bottom: 6px;">Missing keywords</div>{chips}</div>', unsafe_allow_html=True)
         
         if st.session_state.get("ats_analysis"):
              st.markdown('<div style="text-align: left; margin-top: 1rem; padding: 1.5rem; border-top: 1px solid rgba(255,255,255,0.1); background: rgba(0,0,0,0.2); border-radius: 16px;">', unsafe_allow_html=True)
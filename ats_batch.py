@@ -0,0 +1,261 @@
+"""
+Batch ATS ranking: one job description against many resumes.
+
+Resumes (individual files or .zip archives) are extracted in parallel through the
+shared document cache, pre-scored together with the local keyword matcher (one
+resume x term matrix, scored with a single matrix product), and only the top-K by
+keyword coverage are sent to the LLM, with bounded concurrency. iter_batch yields the
+ranked table after every step so callers can show it while results arrive.
+
+Usage:
+    python ats_batch.py JD_FILE RESUME_OR_ZIP [...] [--top-k N] [--workers N] [--csv OUT]
+"""
+import csv
+import io
+import os
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from ats import build_resume_index, jd_terms, llm_ats_analysis, term_requirements
+from doc_cache import get_document
+from doc_extract import extract_document
+
+BATCH_EXTRACT_WORKERS = int(os.getenv("BATCH_EXTRACT_WORKERS", "4"))
+BATCH_LLM_WORKERS = int(os.getenv("BATCH_LLM_WORKERS", "4"))
+BATCH_TOP_K = int(os.getenv("BATCH_TOP_K", "10"))
+RESUME_TYPES = ["pdf", "docx", "doc", "txt"]
+
+TABLE_COLUMNS = ["rank", "file", "coverage", "ai_score", "missing", "status"]
+
+
+def expand_files(files):
+    """
+    Flatten uploads into resume files, unpacking .zip archives.
+
+    Args:
+        files (iterable): (name, bytes) pairs.
+
+    Yields:
+        tuple: (name, bytes) for each file with a supported resume extension.
+    """
+    for name, data in files:
+        ext = name.rsplit(".", 1)[-1].lower()
+        if ext == "zip":
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for info in archive.infolist():
+                    inner = info.filename
+                    if info.is_dir() or inner.startswith("__MACOSX/") or os.path.basename(inner).startswith("."):
+                        continue
+                    if inner.rsplit(".", 1)[-1].lower() in RESUME_TYPES:
+                        yield inner, archive.read(info)
+        elif ext in RESUME_TYPES:
+            yield name, data
+
+
+def read_paths(paths):
+    """Yield (name, bytes) for files on disk; directories are scanned (not recursively)."""
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in sorted(os.listdir(path)):
+                full = os.path.join(path, entry)
+                if os.path.isfile(full):
+                    with open(full, "rb") as f:
+                        yield entry, f.read()
+        else:
+            with open(path, "rb") as f:
+                yield os.path.basename(path), f.read()
+
+
+def extract_resumes(files, max_workers=BATCH_EXTRACT_WORKERS):
+    """
+    Extract resume text in parallel (through the shared document cache).
+
+    Yields:
+        tuple: (index, text, error) as each file finishes, where index is the file's
+            position in `files` (names are not unique); error is None on success.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {
+            pool.submit(get_document, data, name, extract_document): index
+            for index, (name, data) in enumerate(files)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                yield index, future.result()["text"], None
+            except Exception as e:
+                yield index, "", str(e)
+
+
+def prescore(texts, jd_text):
+    """
+    Keyword-score many resumes against one JD in one pass.
+
+    Each term needs a set of index entries (its requirements). Resumes are marked
+    against the JD's distinct requirements, and a term is present where none of its
+    requirements is missing, which is one matrix product for the whole batch.
+
+    Args:
+        texts (list): Resume texts.
+        jd_text (str): Job description.
+
+    Returns:
+        tuple: (scores, missing) - a numpy array of 0-100 coverage scores and, per
+            resume, the list of JD terms it lacks.
+    """
+    terms = jd_terms(jd_text)
+    if not terms or not texts:
+        return np.zeros(len(texts)), [[] for _ in texts]
+    weights = np.array([term.weight for term in terms])
+    columns = {}
+    cells = []
+    for i, term in enumerate(terms):
+        for requirement in term_requirements(term):
+            cells.append((i, columns.setdefault(requirement, len(columns))))
+    needs = np.zeros((len(terms), len(columns)), dtype=np.int32)
+    needs[tuple(np.array(cells).T)] = 1
+
+    by_field = {}
+    for (field, key), column in columns.items():
+        by_field.setdefault(field, {})[key] = column
+    has = np.zeros((len(texts), len(columns)), dtype=np.int32)
+    for r, text in enumerate(texts):
+        index = build_resume_index(text)
+        hits = [keys[key] for field, keys in by_field.items() for key in keys.keys() & getattr(index, field)]
+        has[r, hits] = 1
+    present = ((1 - has) @ needs.T) == 0
+    scores = np.rint(100 * (present @ weights) / weights.sum())
+    missing = [[term.term for term, hit in zip(terms, row) if not hit] for row in present]
+    return scores, missing
+
+
+def ranked(rows):
+    """Sort rows: LLM-scored first (by AI score), then the rest by keyword coverage."""
+    def key(row):
+        if row["ai_score"] is not None:
+            return (0, -row["ai_score"], -row["coverage"])
+        return (1, -row["coverage"], 0)
+
+    rows = sorted(rows, key=key)
+    for position, row in enumerate(rows, 1):
+        row["rank"] = position
+    return rows
+
+
+def iter_batch(files, jd_text, client=None, top_k=BATCH_TOP_K, extract_workers=BATCH_EXTRACT_WORKERS,
+               llm_workers=BATCH_LLM_WORKERS):
+    """
+    Rank resumes against a JD, yielding the table as it fills in.
+
+    Args:
+        files (iterable): (name, bytes) pairs; .zip archives are unpacked.
+        jd_text (str): Job description.
+        client (Groq): Groq client for the LLM stage; None for keyword ranking only.
+        top_k (int): How many of the best keyword matches get an LLM analysis.
+        extract_workers (int): Parallel extractions.
+        llm_workers (int): Concurrent LLM requests.
+
+    Yields:
+        tuple: (status message, rows) - rows are dicts with TABLE_COLUMNS keys plus
+            "analysis" and "upload" (the file's position in the expanded input), sorted by rank.
+    """
+    files = list(expand_files(files))
+    texts = [""] * len(files)
+    errors = [None] * len(files)
+    for done, (index, text, error) in enumerate(extract_resumes(files, extract_workers), 1):
+        texts[index] = text
+        errors[index] = error
+        yield f"Extracted {done}/{len(files)} resumes", []
+
+    scores, missing = prescore(texts, jd_text)
+    rows = [
+        {
+            "rank": 0,
+            "file": name,
+            "coverage": int(score),
+            "ai_score": None,
+            "missing": ", ".join(terms[:8]),
+            "status": f"extraction failed: {error}" if error else ("no text" if not text.strip() else "keywords"),
+            "analysis": "",
+            "upload": index,
+        }
+        for index, ((name, _), text, error, score, terms) in enumerate(zip(files, texts, errors, scores, missing))
+    ]
+    rows = ranked(rows)
+    yield f"Keyword pre-score done for {len(rows)} resumes", rows
+
+    if client is None or top_k <= 0:
+        return
+    shortlist = [row for row in rows if row["status"] == "keywords"][:top_k]
+    with ThreadPoolExecutor(max_workers=max(1, llm_workers)) as pool:
+        futures = {
+            pool.submit(llm_ats_analysis, client, texts[row["upload"]], jd_text, lane="batch"): row
+            for row in shortlist
+        }
+        for row in shortlist:
+            row["status"] = "queued for AI"
+        for done, future in enumerate(as_completed(futures), 1):
+            row = futures[future]
+            try:
+                score, analysis = future.result()
+                row["ai_score"] = score
+                row["analysis"] = analysis
+                row["status"] = "AI scored" if score is not None else "AI reply invalid"
+            except Exception as e:
+                row["status"] = f"AI failed: {e}"
+            rows = ranked(rows)
+            yield f"AI analysis {done}/{len(shortlist)}", rows
+
+
+def main(argv):
+    top_k = BATCH_TOP_K
+    workers = BATCH_LLM_WORKERS
+    csv_path = None
+    paths = []
+    args = iter(argv)
+    for arg in args:
+        if arg == "--top-k":
+            top_k = int(next(args))
+        elif arg == "--workers":
+            workers = int(next(args))
+        elif arg == "--csv":
+            csv_path = next(args)
+        else:
+            paths.append(arg)
+    if len(paths) < 2:
+        print(__doc__)
+        return 2
+
+    with open(paths[0], "r", encoding="utf-8", errors="ignore") as f:
+        jd_text = f.read()
+
+    client = None
+    if top_k > 0:
+        from groq_client import get_groq_client
+        client = get_groq_client()
+        if client is None:
+            print("GROQ_API_KEY not set; ranking by keyword coverage only.")
+
+    rows = []
+    for status, snapshot in iter_batch(read_paths(paths[1:]), jd_text, client, top_k=top_k, llm_workers=workers):
+        print(status, file=sys.stderr)
+        rows = snapshot or rows
+
+    print(f"{'rank':>4}  {'coverage':>8}  {'ai':>4}  {'file':<40} missing")
+    for row in rows:
+        ai = "" if row["ai_score"] is None else row["ai_score"]
+        print(f"{row['rank']:>4}  {row['coverage']:>8}  {ai:>4}  {row['file'][:40]:<40} {row['missing']}")
+
+    if csv_path:
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=TABLE_COLUMNS + ["analysis"], extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,80 @@
+"""
+Background tasks tied to a Streamlit session.
+
+Work is keyed and runs on a small process-wide thread pool. The registry of a session's
+tasks lives in its session_state, so results survive reruns, and submitting a key that
+is already running or finished is a no-op (that makes speculative work safe to request
+on every rerun). Task functions must not touch st.* - they run outside the script thread.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("coach.background_tasks")
+
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "4"))
+
+_executor = ThreadPoolExecutor(max_workers=max(1, BACKGROUND_WORKERS), thread_name_prefix="session-task")
+
+
+class SessionTasks:
+    """Keyed futures for one session."""
+
+    def __init__(self):
+        self._futures = {}
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Start fn(*args, **kwargs) under `key` unless a task with that key is pending,
+        running or finished successfully (a failed task is restarted).
+
+        Returns:
+            Future: The task's future.
+        """
+        future = self._futures.get(key)
+        if future is not None and not (future.done() and (future.cancelled() or future.exception() is not None)):
+            return future
+        logger.info("Starting background task %s", key)
+        future = _executor.submit(fn, *args, **kwargs)
+        self._futures[key] = future
+        return future
+
+    def get(self, key):
+        """Return the task's future, or None if it was never submitted."""
+        return self._futures.get(key)
+
+    def result(self, key, timeout=None):
+        """
+        Wait for a task and return its result.
+
+        Returns:
+            The result, or None if there is no such task or it failed or timed out.
+        """
+        future = self._futures.get(key)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            logger.warning("Background task %s failed: %s", key, e)
+            return None
+
+    def done_results(self, match):
+        """Return {key: result} for finished, successful tasks whose key satisfies match(key)."""
+        results = {}
+        for key, future in self._futures.items():
+            if match(key) and future.done() and not future.cancelled() and future.exception() is None:
+                results[key] = future.result()
+        return results
+
+    def discard(self, match):
+        """Forget tasks whose key satisfies match(key); ones that have not started are cancelled."""
+        for key in [k for k in self._futures if match(k)]:
+            self._futures.pop(key).cancel()
+
+
+def get_session_tasks(session_state):
+    """Return the SessionTasks registry stored in a Streamlit session_state."""
+    if "background_tasks" not in session_state:
+        session_state["background_tasks"] = SessionTasks()
+    return session_state["background_tasks"]
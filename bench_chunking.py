@@ -0,0 +1,81 @@
+"""
+Benchmark text_utils chunking on large inputs and check that it scales linearly.
+
+Usage:
+    python bench_chunking.py [file ...] [--max-tokens N] [--overlap N]
+
+With no file arguments, synthetic resume/JD-like text of 1, 2 and 4 MB is generated.
+For each input the line chunker (chunk_text_meaningfully) and every chunk_document
+mode are timed; MB/s should stay roughly flat as the input grows.
+"""
+import random
+import sys
+import time
+
+from text_utils import CHUNK_MODES, chunk_document, chunk_text_meaningfully, clear_chunk_cache
+
+WORDS = (
+    "python sql docker kubernetes design build maintain scalable data pipelines apis team "
+    "stakeholders delivered reduced latency improved reliability experience years senior"
+).split()
+HEADINGS = ["EXPERIENCE", "Skills:", "## Responsibilities", "EDUCATION", "Requirements:"]
+
+
+def synthetic_text(size_bytes, seed=0):
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    while total < size_bytes:
+        if rng.random() < 0.05:
+            piece = rng.choice(HEADINGS) + "\n"
+        else:
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 30)))
+            piece = sentence.capitalize() + rng.choice([". ", ". ", "! ", ".\n", ".\n\n"])
+        parts.append(piece)
+        total += len(piece)
+    return "".join(parts)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(argv):
+    max_tokens = 800
+    overlap = 0
+    paths = []
+    args = iter(argv)
+    for arg in args:
+        if arg == "--max-tokens":
+            max_tokens = int(next(args))
+        elif arg == "--overlap":
+            overlap = int(next(args))
+        else:
+            paths.append(arg)
+
+    samples = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            samples.append((path, f.read()))
+    if not samples:
+        samples = [(f"synthetic-{mb}MB", synthetic_text(mb * 1024 * 1024)) for mb in (1, 2, 4)]
+
+    print(f"{'input':<24} {'chunker':<22} {'chunks':>8} {'max size':>9} {'seconds':>8} {'MB/s':>7}")
+    for name, text in samples:
+        mb = len(text.encode("utf-8")) / (1024 * 1024)
+
+        clear_chunk_cache()
+        chunks, seconds = timed(lambda: chunk_text_meaningfully(text))
+        longest = max((len(c.split()) for c in chunks), default=0)
+        print(f"{name[:24]:<24} {'lines (words)':<22} {len(chunks):>8,} {longest:>9,} {seconds:>8.2f} {mb / seconds:>7.1f}")
+
+        for mode in CHUNK_MODES:
+            chunks, seconds = timed(lambda: chunk_document(text, max_tokens=max_tokens, mode=mode, overlap_tokens=overlap))
+            longest = max((c.tokens for c in chunks), default=0)
+            print(f"{'':<24} {mode + ' (tokens)':<22} {len(chunks):>8,} {longest:>9,} {seconds:>8.2f} {mb / seconds:>7.1f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,102 @@
+"""
+Compare Vision OCR upload size (and optionally latency) between the original encoding
+(full-resolution RGB JPEG at default quality) and image_prep.prepare_ocr_image.
+
+Usage:
+    python bench_ocr_payload.py [image ...] [--live]
+
+With no image arguments, every PNG/JPEG in the current directory is used; if there are
+none, a synthetic 200-dpi A4 page is rendered. --live also sends both payloads to the
+first vision model and reports round-trip latency (needs GROQ_API_KEY).
+"""
+import base64
+import glob
+import sys
+import time
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from image_prep import prepare_ocr_image
+from vision_ocr import VISION_MODELS, OCR_PROMPT
+
+VISION_MODEL = VISION_MODELS[0]
+
+
+def original_payload(image):
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffered = BytesIO()
+    image.save(buffered, format="JPEG")
+    return buffered.getvalue(), "image/jpeg"
+
+
+def synthetic_page():
+    # A4 at 200 dpi with a few paragraphs of text and a slight tilt
+    page = Image.new("RGB", (1654, 2339), "white")
+    draw = ImageDraw.Draw(page)
+    y = 200
+    for i in range(40):
+        draw.text((180, y), f"Responsibility {i+1}: design, build and maintain data pipelines and APIs.", fill="black")
+        y += 45
+    return page.rotate(1.5, fillcolor="white")
+
+
+def ocr_latency(client, data, mime):
+    start = time.perf_counter()
+    client.chat.completions.create(
+        model=VISION_MODEL,
+        messages=[{
+            "role": "user",
+            "content": [
+                {"type": "text", "text": OCR_PROMPT},
+                {"type": "image_url", "image_url": {"url": f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"}},
+            ],
+        }],
+        temperature=0.0,
+        max_tokens=2048,
+    )
+    return time.perf_counter() - start
+
+
+def main(argv):
+    live = "--live" in argv
+    paths = [a for a in argv if not a.startswith("--")]
+    if not paths:
+        paths = sorted(glob.glob("*.png") + glob.glob("*.jpg") + glob.glob("*.jpeg"))
+
+    samples = [(p, Image.open(p)) for p in paths] or [("synthetic-a4-200dpi", synthetic_page())]
+
+    client = None
+    if live:
+        from groq_client import get_groq_client
+        client = get_groq_client()
+        if client is None:
+            print("GROQ_API_KEY not set; skipping latency measurement.")
+
+    print(f"{'image':<32} {'original':>12} {'prepared':>12} {'ratio':>7} {'prep ms':>8}")
+    total_orig = total_prep = 0
+    for name, image in samples:
+        orig, orig_mime = original_payload(image)
+        start = time.perf_counter()
+        prep, prep_mime = prepare_ocr_image(image)
+        prep_ms = (time.perf_counter() - start) * 1000
+        total_orig += len(orig)
+        total_prep += len(prep)
+        # Request bodies carry base64, which is 4/3 of the raw bytes
+        print(f"{name[:32]:<32} {len(orig) * 4 // 3:>12,} {len(prep) * 4 // 3:>12,} {len(prep) / len(orig):>7.2f} {prep_ms:>8.1f}")
+
+        if client is not None:
+            try:
+                t_orig = ocr_latency(client, orig, orig_mime)
+                t_prep = ocr_latency(client, prep, prep_mime)
+                print(f"{'':<32} OCR latency: original {t_orig:.2f}s, prepared {t_prep:.2f}s")
+            except Exception as e:
+                print(f"{'':<32} OCR latency failed: {e}")
+
+    print(f"\nTotal base64 upload: {total_orig * 4 // 3:,} -> {total_prep * 4 // 3:,} bytes "
+          f"({100 * (1 - total_prep / total_orig):.0f}% smaller)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
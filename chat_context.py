@@ -0,0 +1,143 @@
+"""
+Chat context-window management.
+
+Instead of re-sending the whole history on every turn, build_context keeps the last
+few turns verbatim, folds everything older into a rolling summary (generated once per
+fold and cached), and keeps the total prompt under a per-model token budget. Token
+counts use a local approximation, so no tokenizer download is needed.
+"""
+import os
+
+from llm_cache import cached_completion
+from text_utils import count_tokens
+
+# Prompt token budget per model (context we choose to send, not the model's hard limit)
+MODEL_TOKEN_BUDGETS = {
+    "llama-3.1-8b-instant": 6000,
+    "llama-3.3-70b-versatile": 12000,
+}
+DEFAULT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "6000"))
+# Number of most recent user/assistant turns always sent verbatim
+KEEP_LAST_TURNS = int(os.getenv("CHAT_KEEP_LAST_TURNS", "4"))
+# Older turns are folded in batches, so the summary is refreshed every few turns rather than every turn
+FOLD_EVERY_TURNS = int(os.getenv("CHAT_FOLD_EVERY_TURNS", "3"))
+SUMMARY_MAX_TOKENS = 300
+# Per-message overhead (role and separators) in the chat format
+MESSAGE_OVERHEAD = 4
+
+
+def message_tokens(message):
+    """Approximate tokens for one chat message, including format overhead."""
+    return count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD
+
+
+def token_budget(model):
+    """Return the prompt token budget for a model."""
+    return MODEL_TOKEN_BUDGETS.get(model, DEFAULT_TOKEN_BUDGET)
+
+
+def fit_text(text, max_tokens):
+    """
+    Trim text to roughly max_tokens, cutting at a line break where possible.
+
+    Used to cap large documents (e.g. a resume) embedded in system prompts.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept = []
+    used = 0
+    for line in text.splitlines():
+        cost = count_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept) + "\n[... truncated ...]"
+
+
+def summarize_messages(client, model, previous_summary, messages):
+    """
+    Fold messages into a rolling summary with one (cached) completion.
+
+    Args:
+        client (Groq): The Groq client.
+        model (str): Model used for summarising.
+        previous_summary (str): The summary so far, or "".
+        messages (list): Messages to fold in.
+
+    Returns:
+        str: The updated summary.
+    """
+    transcript = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+    prompt = (
+        (f"Existing summary of the conversation so far:\n{previous_summary}\n\n" if previous_summary else "")
+        + f"New conversation turns:\n{transcript}\n\n"
+        "Update the summary to cover everything above. Keep facts, decisions, the user's goals "
+        "and any open questions. Write at most 150 words."
+    )
+    return cached_completion(
+        client,
+        model=model,
+        messages=[
+            {"role": "system", "content": "You summarise chat transcripts concisely and faithfully."},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.0,
+        max_tokens=SUMMARY_MAX_TOKENS,
+        lane="interactive",
+    )
+
+
+def build_context(client, model, system_prompt, history, state, keep_last_turns=KEEP_LAST_TURNS,
+                  budget=None, reserve_tokens=1024):
+    """
+    Build the messages to send for the next chat turn.
+
+    Args:
+        client (Groq): The Groq client (used only when older turns need folding).
+        model (str): Chat model; selects the token budget.
+        system_prompt (str): The system prompt.
+        history (list): Full chat history (user/assistant messages), newest last.
+        state (dict): Per-conversation summary state, kept in st.session_state
+            ({"upto": number of messages summarised, "summary": str}).
+        keep_last_turns (int): Recent turns always kept verbatim (one turn = user + assistant).
+        budget (int): Prompt token budget. Defaults to token_budget(model).
+        reserve_tokens (int): Tokens left free for the completion.
+
+    Returns:
+        list: Chat messages for the API call.
+    """
+    budget = (budget or token_budget(model)) - reserve_tokens
+    summary = state.get("summary", "")
+    upto = state.get("upto", 0)
+    if upto > len(history):
+        # History was cleared or replaced; start a fresh summary
+        summary, upto = "", 0
+
+    base_tokens = count_tokens(system_prompt) + MESSAGE_OVERHEAD
+    summary_tokens = SUMMARY_MAX_TOKENS + MESSAGE_OVERHEAD
+
+    # Fold down to the last N turns once enough unsummarised turns have piled up,
+    # then fold further while still over budget
+    split = upto
+    if len(history) - upto > 2 * (keep_last_turns + FOLD_EVERY_TURNS):
+        split = len(history) - 2 * keep_last_turns
+    recent_tokens = sum(message_tokens(m) for m in history[split:])
+    while split < len(history) - 1 and base_tokens + summary_tokens + recent_tokens > budget:
+        recent_tokens -= message_tokens(history[split])
+        split += 1
+    # Keep the verbatim window starting on a user message
+    while split < len(history) - 1 and history[split]["role"] != "user":
+        split += 1
+
+    if split > upto:
+        summary = summarize_messages(client, model, summary, history[upto:split])
+        upto = split
+        state["summary"] = summary
+        state["upto"] = upto
+
+    messages = [{"role": "system", "content": system_prompt}]
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    messages.extend(history[upto:])
+    return messages
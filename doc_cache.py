@@ -0,0 +1,90 @@
+"""
+Shared document-extraction service, keyed on the SHA-256 of the uploaded bytes.
+
+A resume or JD is parsed (text layer or OCR) at most once per process: the ATS
+scanner, resume audit/chat and JD interview pages all look the document up here
+first. Each entry records the extracted text, page count, per-page extraction method
+("text" or "ocr") with timings, and the total extraction time.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from kv_cache import TieredCache
+
+logger = logging.getLogger("coach.doc_cache")
+
+CACHE_DIR = os.getenv("COACH_CACHE_DIR", ".cache")
+DOC_CACHE_TTL_SECONDS = float(os.getenv("DOC_CACHE_TTL", str(30 * 24 * 3600)))
+DOC_CACHE_MEMORY_ITEMS = int(os.getenv("DOC_CACHE_MEMORY_ITEMS", "64"))
+DOC_CACHE_MAX_DISK_BYTES = int(os.getenv("DOC_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_doc_cache():
+    """Return the process-wide extraction cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TieredCache(
+                    os.path.join(CACHE_DIR, "documents.sqlite"),
+                    table="extractions",
+                    ttl_seconds=DOC_CACHE_TTL_SECONDS,
+                    memory_items=DOC_CACHE_MEMORY_ITEMS,
+                    max_disk_bytes=DOC_CACHE_MAX_DISK_BYTES,
+                )
+    return _cache
+
+
+def file_sha256(data):
+    """Return the hex SHA-256 of file bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def get_document(data, filename, extractor):
+    """
+    Return the extraction for a file, running `extractor` only on a cache miss.
+
+    Args:
+        data (bytes): The uploaded file contents.
+        filename (str): Original file name (kept for reference; not part of the key).
+        extractor (callable): extractor(data, filename) -> {"text": str, "pages": [...]},
+            where each page is {"page": int, "method": "text" | "ocr", "seconds": float}.
+
+    Returns:
+        dict: {"sha256", "filename", "text", "page_count", "pages", "seconds", "cached"}
+    """
+    key = file_sha256(data)
+    cache = get_doc_cache()
+
+    cached = cache.get(key)
+    if cached is not None:
+        doc = json.loads(cached)
+        doc["cached"] = True
+        logger.info("Document cache hit %s (%s)", key[:12], filename)
+        return doc
+
+    start = time.perf_counter()
+    result = extractor(data, filename)
+    pages = result.get("pages") or []
+    doc = {
+        "sha256": key,
+        "filename": filename,
+        "text": result.get("text", ""),
+        "page_count": len(pages),
+        "pages": pages,
+        "seconds": time.perf_counter() - start,
+    }
+    logger.info("Extracted %s (%s): %d pages in %.2fs", key[:12], filename, doc["page_count"], doc["seconds"])
+
+    # Empty extractions are not cached so a retry (e.g. with an API key set) can succeed
+    if doc["text"].strip():
+        cache.set(key, json.dumps(doc, ensure_ascii=False))
+    doc["cached"] = False
+    return doc
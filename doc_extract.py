@@ -0,0 +1,264 @@
+"""
+Unified document text extraction.
+
+extract_document(data, filename) is the single entry point used by the ATS scanner,
+resume audit and JD interview pages. It picks the fastest backend per format:
+PyMuPDF for PDFs (text layer first, concurrent OCR for scanned pages), python-docx for
+Word files, Vision/Tesseract OCR for images, and direct decoding for JSON and text
+formats. Text is built with list joins, and PDF pages are streamed in order by
+iter_pdf_pages.
+"""
+import base64
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from io import BytesIO
+
+import streamlit as st
+from PIL import Image
+
+import vision_ocr
+from groq_client import get_groq_client
+from image_prep import prepare_ocr_image
+from ocr_engine import get_tesseract_engine, needs_escalation, OCR_PROCESS_WORKERS
+from tesseract_utils import find_tesseract
+
+IMAGE_TYPES = ["png", "jpg", "jpeg"]
+DOCUMENT_TYPES = ["pdf", "docx", "doc", "txt", "json", "csv", "md", "html"]
+SUPPORTED_TYPES = IMAGE_TYPES + DOCUMENT_TYPES
+
+# Concurrent OCR requests for scanned PDF pages
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "4"))
+# Run Tesseract first and only escalate low-confidence pages to Vision OCR
+OCR_PREFER_LOCAL = os.getenv("OCR_PREFER_LOCAL", "0") == "1"
+
+
+def encode_image(image):
+    """Preprocess and encode an image for Vision OCR. Returns (base64 string, MIME type)."""
+    data, mime = prepare_ocr_image(image)
+    return base64.b64encode(data).decode('utf-8'), mime
+
+
+def extract_text_with_groq(image, client_instance):
+    """Use Groq Vision models to extract text, with fallback/hedging across models (see vision_ocr)."""
+    if not client_instance:
+         raise Exception("Groq API Key missing for Vision OCR.")
+    
+    base64_image, mime = encode_image(image)
+    return vision_ocr.extract_text(client_instance, base64_image, mime)
+
+
+def extract_text_from_image(image, warn=None):
+    """
+    OCR an image with Groq Vision, falling back to Tesseract.
+
+    With OCR_PREFER_LOCAL=1, Tesseract runs first and the page is escalated to Vision
+    OCR only when its mean word confidence is below OCR_MIN_CONFIDENCE.
+
+    Args:
+        image (PIL.Image): The image to read.
+        warn (callable): Receives user-facing warning messages. Defaults to st.warning;
+            worker threads pass a collector instead, since they cannot render.
+    """
+    warn = warn or st.warning
+    vision_key = os.getenv("GROQ_API_KEY")
+    engine = get_tesseract_engine()
+
+    # 0. Optional local-first pass (multi-core Tesseract pool)
+    local_result = None
+    if OCR_PREFER_LOCAL and engine.available():
+        try:
+            local_result = engine.recognize_one(image)
+            if not vision_key or not needs_escalation(local_result):
+                return local_result.text
+        except Exception as local_error:
+            warn(f"Local OCR failed: {local_error}")
+
+    # 1. Try Groq Vision First (Serverless, No Install, High Accuracy)
+    if vision_key:
+         try:
+             return extract_text_with_groq(image, get_groq_client(vision_key))
+         except Exception as vision_error:
+             if "401" in str(vision_error):
+                 warn("⚠️ Vision OCR Failed: Invalid API Key. Please update it in the Sidebar Settings.")
+             else:
+                 warn(f"Vision OCR failed (Switching to Tesseract): {vision_error}")
+             # Fall through to Tesseract
+    
+    # 2. Try Tesseract as Backup (binary location is resolved once per process)
+    if local_result is not None:
+        return local_result.text
+    try:
+        return engine.recognize_one(image).text
+    except Exception:
+        raise Exception("OCR Failed: Groq Vision Model ineffective AND Tesseract not installed.\n\n👉 ACTION: Update your API Key in the Sidebar Settings, or use 'Paste Text' mode.")
+
+
+
+def _timed_ocr(image, warn):
+    start = time.perf_counter()
+    text = extract_text_from_image(image, warn)
+    return text, time.perf_counter() - start
+
+
+def iter_pdf_pages(pdf_bytes, max_workers=OCR_MAX_WORKERS, on_page=None, warn=None):
+    """
+    Stream a PDF's pages in order, OCR-ing scanned pages concurrently.
+
+    Pages with a text layer are taken immediately; pages with less than 50 characters
+    of text are rendered at 200 dpi on the calling thread (fitz is not thread-safe) and
+    OCR'd on a bounded thread pool while the next pages are rendered. Each page is
+    yielded as soon as it and every page before it are done.
+
+    Args:
+        pdf_bytes (bytes): The PDF file contents.
+        max_workers (int): Maximum concurrent OCR requests.
+        on_page (callable): Called as on_page(page_num, total_pages, method) each time a
+            page finishes (in completion order), from the calling thread.
+        warn (callable): Receives OCR warnings, from the calling thread.
+
+    Yields:
+        dict: {"page", "method", "seconds", "text"} per page, in page order.
+    """
+    import fitz  # PyMuPDF
+
+    if (OCR_PREFER_LOCAL or not os.getenv("GROQ_API_KEY")) and find_tesseract():
+        # Local OCR is CPU-bound in the process pool; feed it enough pages to use every core
+        max_workers = max(max_workers, OCR_PROCESS_WORKERS)
+
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    total = doc.page_count
+    finished = {}
+    pending = {}
+    warnings = []
+    next_page = 0
+
+    def collect(done):
+        for future in done:
+            page_num, render_seconds = pending.pop(future)
+            text, ocr_seconds = future.result()
+            finished[page_num] = {
+                "page": page_num + 1,
+                "method": "ocr",
+                "seconds": render_seconds + ocr_seconds,
+                "text": f"\n--- Page {page_num+1} (OCR) ---\n" + text,
+            }
+            if on_page:
+                on_page(page_num, total, "ocr")
+
+    def ready():
+        nonlocal next_page
+        while next_page in finished:
+            yield finished.pop(next_page)
+            next_page += 1
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pdf-ocr") as pool:
+            for page_num, page in enumerate(doc):
+                start = time.perf_counter()
+                text = page.get_text()
+
+                # Check if page is likely scanned (very little text)
+                if len(text.strip()) >= 50:
+                    finished[page_num] = {"page": page_num + 1, "method": "text", "seconds": time.perf_counter() - start, "text": text}
+                    if on_page:
+                        on_page(page_num, total, "text")
+                else:
+                    # Keep at most two rendered pages queued per worker
+                    if len(pending) >= max_workers * 2:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+
+                    pix = page.get_pixmap(dpi=200)
+                    img_data = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+                    future = pool.submit(_timed_ocr, img_data, warnings.append)
+                    pending[future] = (page_num, time.perf_counter() - start)
+
+                collect([f for f in pending if f.done()])
+                yield from ready()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+                yield from ready()
+    finally:
+        doc.close()
+        if warn:
+            for message in dict.fromkeys(warnings):
+                warn(message)
+
+
+def extract_pdf_text(pdf_bytes, max_workers=OCR_MAX_WORKERS, on_page=None, warn=None):
+    """Extract a PDF's text (see iter_pdf_pages), joined in page order."""
+    return "".join(p["text"] for p in iter_pdf_pages(pdf_bytes, max_workers, on_page, warn))
+
+
+def decode_text(data, warn=None):
+    """Decode text bytes as UTF-8, falling back to latin-1."""
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        if warn:
+            warn("Could not decode as UTF-8. Trying fallback encoding...")
+        return data.decode("latin-1")
+
+
+def extract_document(data, filename, on_page=None, warn=None):
+    """
+    Extract text from an uploaded document. Also the doc_cache extractor for every page.
+
+    Args:
+        data (bytes): File contents.
+        filename (str): File name; the extension selects the backend.
+        on_page (callable): PDF page progress callback (see iter_pdf_pages).
+        warn (callable): Receives non-fatal warnings.
+
+    Returns:
+        dict: {"text": str, "pages": [{"page", "method", "seconds"}]}
+    """
+    file_type = filename.split('.')[-1].lower()
+    start = time.perf_counter()
+
+    # --- Image (OCR) ---
+    if file_type in IMAGE_TYPES:
+        text = extract_text_from_image(Image.open(BytesIO(data)), warn)
+        return {"text": text, "pages": [{"page": 1, "method": "ocr", "seconds": time.perf_counter() - start}]}
+
+    # --- PDF Handling (Text + OCR Fallback) ---
+    if file_type == "pdf":
+        texts = []
+        pages = []
+        try:
+            for page in iter_pdf_pages(data, on_page=on_page, warn=warn):
+                texts.append(page.pop("text"))
+                pages.append(page)
+        except ImportError:
+            raise Exception("PyMuPDF (fitz) is missing. Please ensure requirements.txt is installed.")
+        return {"text": "".join(texts), "pages": pages}
+
+    # --- JSON Handling ---
+    if file_type == "json":
+        try:
+            # Convert JSON to a readable string format
+            text = json.dumps(json.loads(data), indent=2)
+        except Exception as e:
+            raise Exception(f"JSON Error: {e}")
+
+    # --- Word Document ---
+    elif file_type in ["docx", "doc"]:
+        try:
+            import docx
+        except ImportError:
+            raise Exception("python-docx library is missing. Run: `pip install python-docx`")
+        try:
+            doc = docx.Document(BytesIO(data))
+        except Exception as e:
+            raise Exception(f"Error reading DOCX file: {str(e)}")
+        text = "\n".join(para.text for para in doc.paragraphs) + "\n"
+
+    # --- Generic Text Handling (TXT, CSV, MD, HTML) ---
+    else:
+        text = decode_text(data, warn)
+
+    return {"text": text, "pages": [{"page": 1, "method": "text", "seconds": time.perf_counter() - start}]}
@@ -1,12 +1,33 @@
 import streamlit as st
-import os
-from dotenv import load_dotenv
-from groq import Groq
 import speech_recognition as sr
+from groq_client import get_groq_client
+from llm_cache import stream_completion
+from ai_display import stream_to_placeholder
+from chat_context import build_context
+from session_store import get_session_store
+
+
+def user_bubble(content):
+    return f"""
+        <div style="display: flex; justify-content: flex-end; margin-bottom: 1.5rem;">
+            <div class="glass-card" style="padding: 1.5rem 2rem; border-radius: 20px 20px 4px 20px; max-width: 75%; background: linear-gradient(135deg, #6B2E9E, #8B42C4); border: 2px solid rgba(139, 66, 196, 0.6); box-shadow: 0 8px 32px rgba(107, 46, 158, 0.4);">
+                <div style="color: #FFFFFF; font-size: 1.05rem; line-height: 1.6; font-weight: 500; text-shadow: 0 1px 2px rgba(0,0,0,0.2);">{content}</div>
+            </div>
+        </div>
+    """
+
+
+def assistant_bubble(content):
+    return f"""
+        <div style="display: flex; justify-content: flex-start; margin-bottom: 1.5rem;">
+            <div class="glass-card" style="padding: 1.5rem 2rem; border-radius: 20px 20px 20px 4px; max-width: 75%; border: 2px solid rgba(6, 182, 212, 0.4); box-shadow: 0 8px 32px rgba(6, 182, 212, 0.2);">
+                <div style="color: #FFFFFF; font-size: 1.05rem; line-height: 1.7; font-weight: 400;">{content}</div>
+            </div>
+        </div>
+    """
+
 
 def show_chat():
-    load_dotenv()
-    
     # Page configuration
     st.set_page_config(page_title="AI Interview Coach", page_icon="💫", layout="wide")
 
@@ -35,36 +56,61 @@ def show_chat():
     if "voice_text" not in st.session_state:
         st.session_state.voice_text = ""
 
+    # ---------------- PERSISTENT SESSIONS ----------------
+    store = get_session_store()
+
+    def open_session(session_id):
+        st.session_state.chat_session_id = session_id
+        st.session_state.messages = store.get_messages(session_id) if session_id else []
+        st.session_state.chat_summary = {}
+        if session_id:
+            st.query_params["sid"] = session_id
+        elif "sid" in st.query_params:
+            del st.query_params["sid"]
+
+    # Resume the session in the URL (?sid=...) after a browser reload
+    if "chat_session_id" not in st.session_state:
+        sid = st.query_params.get("sid")
+        open_session(sid if sid and store.get_session(sid) else None)
+
+    with st.sidebar:
+        st.markdown("### 💬 Chat Sessions")
+        if st.button("➕ New Chat", use_container_width=True):
+            open_session(None)
+            st.rerun()
+
+        page_size = 10
+        shown = page_size * st.session_state.get("chat_session_pages", 1)
+        sessions = store.list_sessions(limit=shown)
+        for session in sessions:
+            label = ("▶ " if session["id"] == st.session_state.chat_session_id else "") + session["title"]
+            if st.button(label, key=f"session_{session['id']}", use_container_width=True):
+                open_session(session["id"])
+                st.rerun()
+        if len(sessions) == shown and st.button("Load more", use_container_width=True):
+            st.session_state.chat_session_pages = st.session_state.get("chat_session_pages", 1) + 1
+            st.rerun()
+
     # Initialize Groq client
-    GROQ_API_KEY = os.getenv("GROQ_API_KEY")
     MODEL = "llama-3.1-8b-instant"
     
     try:
-        client = Groq(api_key=GROQ_API_KEY)
+        client = get_groq_client()
     except Exception as e:
         st.error(f"Error initializing Groq client: {e}")
         return
+    if client is None:
+        st.error("Error initializing Groq client: GROQ_API_KEY not found.")
+        return
 
     # ---------------- CHAT DISPLAY ----------------
     chat_container = st.container()
     with chat_container:
         for msg in st.session_state.messages:
             if msg["role"] == "user":
-                st.markdown(f"""
-                    <div style="display: flex; justify-content: flex-end; margin-bottom: 1.5rem;">
-                        <div class="glass-card" style="padding: 1.5rem 2rem; border-radius: 20px 20px 4px 20px; max-width: 75%; background: linear-gradient(135deg, #6B2E9E, #8B42C4); border: 2px solid rgba(139, 66, 196, 0.6); box-shadow: 0 8px 32px rgba(107, 46, 158, 0.4);">
-                            <div style="color: #FFFFFF; font-size: 1.05rem; line-height: 1.6; font-weight: 500; text-shadow: 0 1px 2px rgba(0,0,0,0.2);">{msg["content"]}</div>
-                        </div>
-                    </div>
-                """, unsafe_allow_html=True)
+                st.markdown(user_bubble(msg["content"]), unsafe_allow_html=True)
             elif msg["role"] == "assistant":
-                st.markdown(f"""
-                    <div style="display: flex; justify-content: flex-start; margin-bottom: 1.5rem;">
-                        <div class="glass-card" style="padding: 1.5rem 2rem; border-radius: 20px 20px 20px 4px; max-width: 75%; border: 2px solid rgba(6, 182, 212, 0.4); box-shadow: 0 8px 32px rgba(6, 182, 212, 0.2);">
-                            <div style="color: #FFFFFF; font-size: 1.05rem; line-height: 1.7; font-weight: 400;">{msg["content"]}</div>
-                        </div>
-                    </div>
-                """, unsafe_allow_html=True)
+                st.markdown(assistant_bubble(msg["content"]), unsafe_allow_html=True)
 
     # ---------------- INPUT AREA ----------------
     st.markdown("""<div style="height: 100px;"></div>""", unsafe_allow_html=True) # Spacer
@@ -95,25 +141,40 @@ def show_chat():
     prompt = typed or st.session_state.voice_text
     
     if prompt:
-        # Add user message
+        # Add user message (sessions are created on the first message, so none are left empty)
+        if not st.session_state.chat_session_id:
+            title = prompt if len(prompt) <= 40 else prompt[:40].rstrip() + "…"
+            open_session(store.create_session(title=title))
         st.session_state.messages.append({"role": "user", "content": prompt})
+        store.append_message(st.session_state.chat_session_id, "user", prompt)
         st.session_state.voice_text = ""
         
-        # Get AI response
+        # Stream AI response into the chat as tokens arrive
+        with chat_container:
+            st.markdown(user_bubble(prompt), unsafe_allow_html=True)
+            response_slot = st.empty()
         try:
-            with st.spinner("🌌 Cosmic AI thinking..."):
-                chat_completion = client.chat.completions.create(
-                    messages=[
-                        {"role": "system", "content": "You are an expert AI interview coach. Help users prepare for technical interviews with detailed, accurate, and encouraging responses."},
-                        *st.session_state.messages
-                    ],
-                    model=MODEL,
-                    temperature=0.7,
-                    max_tokens=1024
-                )
-                
-                ai_response = chat_completion.choices[0].message.content
-                st.session_state.messages.append({"role": "assistant", "content": ai_response})
+            # Last few turns verbatim, older turns folded into a rolling summary, under the token budget
+            context_messages = build_context(
+                client,
+                MODEL,
+                "You are an expert AI interview coach. Help users prepare for technical interviews with detailed, accurate, and encouraging responses.",
+                st.session_state.messages,
+                state=st.session_state.setdefault("chat_summary", {}),
+            )
+            chunks = stream_completion(
+                client,
+                messages=context_messages,
+                model=MODEL,
+                temperature=0.7,
+                max_tokens=1024,
+                lane="interactive",
+            )
+            ai_response = stream_to_placeholder(response_slot, chunks, render=assistant_bubble)
+            
+            # Append only once the stream has completed
+            st.session_state.messages.append({"role": "assistant", "content": ai_response})
+            store.append_message(st.session_state.chat_session_id, "assistant", ai_response)
                 
         except Exception as e:
             st.error(f"Error getting AI response: {e}")
@@ -0,0 +1,57 @@
+"""
+Shared Groq client pool.
+
+One Groq client (backed by a keep-alive httpx connection pool) is built per API key
+and reused across Streamlit reruns and sessions, so TLS handshakes and connection
+setup are paid once per process instead of on every widget interaction.
+"""
+import os
+
+import httpx
+import streamlit as st
+from dotenv import load_dotenv
+from groq import Groq
+
+# Read .env once per process instead of on every rerun
+load_dotenv()
+
+# Connection pool settings for the shared HTTP client
+MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GROQ_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "120"))
+REQUEST_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "60"))
+
+
+def get_api_key():
+    """Return the Groq API key from the environment (populated from .env at import)."""
+    return os.getenv("GROQ_API_KEY")
+
+
+@st.cache_resource(show_spinner=False)
+def _build_client(api_key):
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=10.0),
+    )
+    # Retries are handled by llm_scheduler, which also respects the rate limits
+    return Groq(api_key=api_key, http_client=http_client, max_retries=0)
+
+
+def get_groq_client(api_key=None):
+    """
+    Return the process-wide Groq client for an API key.
+
+    Args:
+        api_key (str): The key to use. Defaults to GROQ_API_KEY from the environment.
+
+    Returns:
+        Groq or None: A pooled client, or None if no key is available.
+    """
+    api_key = api_key or get_api_key()
+    if not api_key:
+        return None
+    return _build_client(api_key)
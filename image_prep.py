@@ -0,0 +1,140 @@
+"""
+Image preprocessing for vision OCR.
+
+Shrinks page renders and photos before they are base64-encoded into a request:
+grayscale conversion, deskew, crop to the content bounding box, downscale to a
+maximum side, and JPEG/WebP encoding with quality lowered until the payload fits
+a byte budget.
+"""
+import os
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "1600"))
+OCR_TARGET_BYTES = int(os.getenv("OCR_TARGET_KB", "350")) * 1024
+OCR_IMAGE_FORMAT = os.getenv("OCR_IMAGE_FORMAT", "JPEG").upper()
+OCR_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "1") == "1"
+OCR_DESKEW = os.getenv("OCR_DESKEW", "1") == "1"
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+def crop_to_content(image, threshold=40, margin=16):
+    """
+    Crop an image to the bounding box of its dark (ink) pixels.
+
+    Args:
+        image (PIL.Image): Grayscale or RGB image.
+        threshold (int): Darkness (0-255, after inversion) above which a pixel counts as ink.
+        margin (int): Pixels of padding kept around the content.
+
+    Returns:
+        PIL.Image: The cropped image, or the input if no content was found.
+    """
+    gray = image if image.mode == "L" else image.convert("L")
+    mask = ImageOps.invert(gray).point(lambda p: 255 if p > threshold else 0)
+    bbox = mask.getbbox()
+    if not bbox:
+        return image
+    left, top, right, bottom = bbox
+    return image.crop((
+        max(0, left - margin),
+        max(0, top - margin),
+        min(image.width, right + margin),
+        min(image.height, bottom + margin),
+    ))
+
+
+def _row_profile_score(image):
+    # Resizing to one column averages each row; text lines aligned with the axis
+    # give the sharpest (highest-variance) row profile.
+    rows = list(image.resize((1, image.height), Image.BOX).getdata())
+    mean = sum(rows) / len(rows)
+    return sum((r - mean) ** 2 for r in rows)
+
+
+def estimate_skew(gray, max_angle=5.0, step=0.5, probe_width=400):
+    """
+    Estimate page skew in degrees with a projection-profile search on a small probe.
+
+    Args:
+        gray (PIL.Image): Grayscale image.
+        max_angle (float): Largest rotation tried in either direction.
+        step (float): Angle increment.
+        probe_width (int): Width the image is downscaled to before searching.
+
+    Returns:
+        float: The rotation (degrees, counter-clockwise) that best straightens the text.
+    """
+    scale = probe_width / float(gray.width)
+    if scale < 1:
+        probe = gray.resize((probe_width, max(1, int(gray.height * scale))), Image.BILINEAR)
+    else:
+        probe = gray
+    probe = ImageOps.invert(probe)
+
+    best_angle, best_score = 0.0, _row_profile_score(probe)
+    steps = int(max_angle / step)
+    for i in range(-steps, steps + 1):
+        angle = i * step
+        if angle == 0:
+            continue
+        score = _row_profile_score(probe.rotate(angle, resample=Image.BILINEAR, fillcolor=0))
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def encode_adaptive(image, fmt=OCR_IMAGE_FORMAT, target_bytes=OCR_TARGET_BYTES,
+                    max_quality=85, min_quality=40, quality_step=10):
+    """
+    Encode an image, lowering quality until it fits the byte budget.
+
+    Returns:
+        tuple: (encoded bytes, quality used).
+    """
+    quality = max_quality
+    while True:
+        buffered = BytesIO()
+        image.save(buffered, format=fmt, quality=quality, optimize=(fmt == "JPEG"))
+        data = buffered.getvalue()
+        if len(data) <= target_bytes or quality <= min_quality:
+            return data, quality
+        quality = max(min_quality, quality - quality_step)
+
+
+def prepare_ocr_image(image, grayscale=OCR_GRAYSCALE, deskew=OCR_DESKEW, crop=True,
+                      max_side=OCR_MAX_SIDE, fmt=OCR_IMAGE_FORMAT, target_bytes=OCR_TARGET_BYTES):
+    """
+    Preprocess an image and encode it for a vision OCR request.
+
+    Args:
+        image (PIL.Image): Source image (any mode).
+        grayscale (bool): Convert to grayscale. Text OCR does not need colour.
+        deskew (bool): Straighten small rotations (up to 5 degrees).
+        crop (bool): Crop to the content bounding box.
+        max_side (int): Downscale so the longer side is at most this many pixels (0 disables).
+        fmt (str): "JPEG" or "WEBP".
+        target_bytes (int): Payload budget used to pick the encoding quality.
+
+    Returns:
+        tuple: (encoded bytes, MIME type).
+    """
+    work = image.convert("L") if grayscale else image.convert("RGB")
+    fill = 255 if grayscale else (255, 255, 255)
+
+    if deskew:
+        angle = estimate_skew(work if grayscale else work.convert("L"))
+        if angle:
+            work = work.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=fill)
+
+    if crop:
+        work = crop_to_content(work)
+
+    if max_side and max(work.size) > max_side:
+        work = work.copy()
+        work.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    data, _ = encode_adaptive(work, fmt=fmt, target_bytes=target_bytes)
+    return data, MIME_TYPES.get(fmt, "image/jpeg")
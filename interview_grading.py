@@ -0,0 +1,159 @@
+"""
+Per-question grading for the JD mock interview.
+
+Each answer is graded with its own small request as soon as it is submitted, on a
+process-wide thread pool, so grading overlaps with the candidate answering the next
+question. The feedback page then only waits for any grades still in flight and
+assembles the report locally (2 marks per question, skipped answers score 0).
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from structured_output import structured_completion
+
+logger = logging.getLogger("coach.interview_grading")
+
+GRADE_MODEL = "llama-3.1-8b-instant"
+GRADE_WORKERS = int(os.getenv("INTERVIEW_GRADE_WORKERS", "4"))
+GRADE_MAX_TOKENS = 300
+GRADE_RETRIES = int(os.getenv("INTERVIEW_GRADE_RETRIES", "1"))
+MAX_MARKS = 2.0
+# Characters of the job description included with every grading request
+GRADE_JD_CHARS = 2000
+
+GRADE_SYSTEM_PROMPT = (
+    "You are a strictly objective interview auditor. Judge only what the candidate wrote; do not "
+    "grant marks for skills listed in the job description unless the answer proves them. "
+    "Score the answer from 0 to 2 marks (e.g. 0.5, 1.25, 2.0) by how well it satisfies the question. "
+    "Give the main strength, the main gap and a short quote from the answer as evidence; use an "
+    "empty string for any that do not apply."
+)
+GRADE_SCHEMA = {
+    "type": "object",
+    "required": ["marks"],
+    "properties": {
+        "marks": {"type": "number", "minimum": 0, "maximum": MAX_MARKS},
+        "strength": {"type": "string"},
+        "gap": {"type": "string"},
+        "evidence": {"type": "string"},
+    },
+}
+
+_executor = ThreadPoolExecutor(max_workers=max(1, GRADE_WORKERS), thread_name_prefix="interview-grade")
+
+
+def skipped_grade():
+    return {"marks": 0.0, "strength": "", "gap": "Skipped - no evidence provided.", "evidence": ""}
+
+
+def normalize_grade(data):
+    grade = {"marks": data["marks"]}
+    for field in ("strength", "gap", "evidence"):
+        value = data.get(field)
+        grade[field] = value.strip() if isinstance(value, str) else ""
+    return grade
+
+
+def grade_answer(client, question, answer, jd_text=""):
+    """
+    Grade one interview answer.
+
+    Args:
+        client (Groq): The Groq client.
+        question (str): The interview question.
+        answer (str): The candidate's answer; empty means skipped and is graded locally.
+        jd_text (str): The job description, for context.
+
+    Returns:
+        dict: {"marks", "strength", "gap", "evidence"}.
+
+    Raises:
+        StructuredOutputError: If the model does not return a valid grade, even after a retry.
+    """
+    if not answer.strip():
+        return skipped_grade()
+    prompt = f"Job Description (excerpt):\n{jd_text[:GRADE_JD_CHARS]}\n\nQuestion: {question}\n\nCandidate's Answer: {answer}"
+    messages = [
+        {"role": "system", "content": GRADE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+    grade = structured_completion(
+        client, model=GRADE_MODEL, messages=messages, schema=GRADE_SCHEMA,
+        retries=GRADE_RETRIES, max_tokens=GRADE_MAX_TOKENS,
+    )
+    return normalize_grade(grade)
+
+
+def submit_grade(client, question, answer, jd_text=""):
+    """Start grading an answer in the background; returns a Future of grade_answer's result."""
+    return _executor.submit(grade_answer, client, question, answer, jd_text)
+
+
+def collect_grades(futures, count, timeout=None):
+    """
+    Wait for background grades.
+
+    Args:
+        futures (dict): Question index -> Future from submit_grade.
+        count (int): Number of questions.
+        timeout (float): Seconds to wait for grades still in flight.
+
+    Returns:
+        list: One grade dict per question, or None where grading failed or is missing.
+    """
+    wait(list(futures.values()), timeout=timeout)
+    grades = [None] * count
+    for index, future in futures.items():
+        if index >= count or not future.done():
+            continue
+        try:
+            grades[index] = future.result()
+        except Exception as e:
+            logger.warning("Grading question %d failed: %s", index + 1, e)
+    return grades
+
+
+def verdict(ratio):
+    if ratio >= 0.75:
+        return "Strong performance - the answers give clear evidence for the role's requirements."
+    if ratio >= 0.5:
+        return "Borderline - some requirements are evidenced, but the gaps below would need to be addressed before a hire decision."
+    return "Not yet ready - too many questions were skipped or answered without evidence for the role's requirements."
+
+
+def format_feedback(questions, grades):
+    """
+    Build the Markdown evaluation report from per-question grades.
+
+    Questions without a grade are listed as not evaluated and left out of the total.
+    """
+    graded = [(i, g) for i, g in enumerate(grades) if g is not None]
+    obtained = sum(g["marks"] for _, g in graded)
+    possible = MAX_MARKS * len(graded)
+
+    lines = [f"### **Overall performance Score**: {obtained:g} / {possible:g}", "", "#### **Score Breakdown**:"]
+    for i, grade in enumerate(grades):
+        lines.append(f"- Q{i + 1}: " + (f"{grade['marks']:g}/{MAX_MARKS:g}" if grade else "not evaluated"))
+
+    lines += ["", "#### **Demonstrated Strengths (Attended Questions)**:"]
+    strengths = [
+        f"- {g['strength']} ({g['marks']:g}/{MAX_MARKS:g})" + (f" (Evidence: \"{g['evidence']}\")" if g["evidence"] else "")
+        for _, g in graded if g["strength"] and g["marks"] > 0
+    ]
+    lines += strengths or ["- None demonstrated."]
+
+    lines += ["", "#### **Gaps & Weaknesses (Skipped & Poor Answers)**:"]
+    gaps = []
+    for i, g in graded:
+        if g == skipped_grade():
+            gaps.append(f"- **Skipped Question {i + 1}**: Major Gap - No evidence provided (0/{MAX_MARKS:g} Marks)")
+        elif g["gap"]:
+            gaps.append(f"- **Question {i + 1}**: {g['gap']}")
+    lines += gaps or ["- None found."]
+
+    if len(graded) < len(questions):
+        lines += ["", f"_{len(questions) - len(graded)} question(s) could not be evaluated and are not counted._"]
+
+    lines += ["", "#### **Final Verdict**:", verdict(obtained / possible) if possible else "No answers could be evaluated."]
+    return "\n".join(lines)
@@ -0,0 +1,194 @@
+"""
+Append-only JSONL journals for per-session transcripts.
+
+Each event is one JSON line appended to the session's journal file, so persisting a
+message is one small write rather than a rewrite of a whole document. fsync is batched:
+the file is synced after every FSYNC_EVERY appends, and a background flusher syncs any
+remaining appends within FSYNC_INTERVAL seconds. Replaying streams the file line by
+line; compaction folds the events into a snapshot and atomically replaces the file.
+
+Open journals are kept in a bounded LRU: the least recently used one is closed when
+more than MAX_OPEN_JOURNALS are open, and the flusher closes journals that have been
+idle for JOURNAL_IDLE_SECONDS. A closed journal reopens its file on the next append.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+JOURNAL_DIR = os.getenv("COACH_JOURNAL_DIR", "journals")
+FSYNC_EVERY = int(os.getenv("JOURNAL_FSYNC_EVERY", "8"))
+FSYNC_INTERVAL = float(os.getenv("JOURNAL_FSYNC_INTERVAL", "1.0"))
+# Compact once this many events have been appended since the last snapshot
+# (an interview writes about a dozen events)
+COMPACT_AFTER = int(os.getenv("JOURNAL_COMPACT_AFTER", "32"))
+MAX_OPEN_JOURNALS = int(os.getenv("JOURNAL_MAX_OPEN", "64"))
+JOURNAL_IDLE_SECONDS = float(os.getenv("JOURNAL_IDLE_SECONDS", "300"))
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class Journal:
+    """An append-only JSONL file with batched fsync. Safe to share across threads."""
+
+    def __init__(self, path, fsync_every=FSYNC_EVERY):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._lock = threading.Lock()
+        self._file = None
+        self._unsynced = 0
+        self.appends_since_compaction = 0
+        self.last_used = time.monotonic()
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            # Terminate a torn final line so the next event starts on its own line
+            if self._file.tell() > 0:
+                with open(self.path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        self._file.write("\n")
+        return self._file
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def append(self, record):
+        """Append one event. Durable on disk after the next batched fsync."""
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            f = self._open()
+            f.write(line)
+            f.flush()
+            self._unsynced += 1
+            self.appends_since_compaction += 1
+            self.last_used = time.monotonic()
+            if self._unsynced >= self.fsync_every:
+                self._sync_locked()
+
+    def _sync_locked(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def sync(self):
+        """Force pending appends to disk."""
+        with self._lock:
+            self._sync_locked()
+
+    def replay(self):
+        """
+        Stream the journal's events, oldest first.
+
+        A torn final line (from a crash mid-write) is skipped.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def compact(self, fold):
+        """
+        Replace the journal with the records returned by fold(events).
+
+        The compacted file is written to a temporary path, fsynced and renamed over the
+        journal, so readers see either the old or the new file.
+
+        Args:
+            fold (callable): Takes an iterator of events, returns a list of records.
+        """
+        with self._lock:
+            records = fold(self.replay())
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            os.replace(tmp_path, self.path)
+            self._unsynced = 0
+            self.appends_since_compaction = 0
+
+    def maybe_compact(self, fold, threshold=COMPACT_AFTER):
+        """Compact if enough events have been appended since the last compaction."""
+        if self.appends_since_compaction >= threshold:
+            self.compact(fold)
+            return True
+        return False
+
+    def close(self):
+        with self._lock:
+            self._sync_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_journals = OrderedDict()
+_journals_lock = threading.Lock()
+_flusher = None
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FSYNC_INTERVAL)
+        idle_before = time.monotonic() - JOURNAL_IDLE_SECONDS
+        with _journals_lock:
+            idle = [name for name, journal in _journals.items() if journal.last_used < idle_before]
+            closing = [_journals.pop(name) for name in idle]
+            journals = list(_journals.values())
+        for journal in closing:
+            try:
+                journal.close()
+            except Exception:
+                pass
+        for journal in journals:
+            try:
+                journal.sync()
+            except Exception:
+                pass
+
+
+def get_journal(kind, session_id):
+    """
+    Return the process-wide journal for a session.
+
+    Args:
+        kind (str): Transcript type, e.g. "interview".
+        session_id (str): The session's ID.
+    """
+    global _flusher
+    name = _SAFE_NAME.sub("_", f"{kind}-{session_id}")
+    evicted = []
+    with _journals_lock:
+        journal = _journals.get(name)
+        if journal is None:
+            journal = Journal(os.path.join(JOURNAL_DIR, name + ".jsonl"))
+            _journals[name] = journal
+        else:
+            _journals.move_to_end(name)
+        journal.last_used = time.monotonic()
+        while len(_journals) > MAX_OPEN_JOURNALS:
+            evicted.append(_journals.popitem(last=False)[1])
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="journal-flusher", daemon=True)
+            _flusher.start()
+    for old in evicted:
+        old.close()
+    return journal
@@ -0,0 +1,182 @@
+"""
+Content-addressed cache for Groq chat completions.
+
+Completions are keyed on a SHA-256 of the request (model, messages, temperature,
+response_format, max_tokens). Lookups go through an in-memory LRU first and an
+on-disk SQLite store second; entries expire after a TTL and the disk store is
+trimmed to a maximum size, least recently used first.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from kv_cache import TieredCache
+from llm_scheduler import DEFAULT_COMPLETION_TOKENS, get_scheduler
+from text_utils import count_tokens
+
+logger = logging.getLogger("coach.llm_cache")
+
+CACHE_DIR = os.getenv("COACH_CACHE_DIR", ".cache")
+CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MEMORY_ITEMS = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "256"))
+CACHE_MAX_DISK_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def make_cache_key(model, messages, temperature=None, response_format=None, max_tokens=None):
+    """
+    Build the content address for a completion request.
+
+    Args:
+        model (str): Model ID.
+        messages (list): Chat messages as sent to the API.
+        temperature (float): Sampling temperature, if set.
+        response_format (dict): Response format, if set.
+        max_tokens (int): Completion token limit, if set.
+
+    Returns:
+        str: Hex SHA-256 digest of the canonicalised request.
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "response_format": response_format,
+            "max_tokens": max_tokens,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """Rough prompt + completion tokens of a request, for the scheduler's TPM budget."""
+    prompt = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            prompt += count_tokens(content)
+        elif isinstance(content, list):
+            prompt += sum(count_tokens(part.get("text", "")) for part in content if isinstance(part, dict))
+    return prompt + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+def get_cache():
+    """Return the process-wide completion cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TieredCache(
+                    os.path.join(CACHE_DIR, "llm_cache.sqlite"),
+                    table="completions",
+                    ttl_seconds=CACHE_TTL_SECONDS,
+                    memory_items=CACHE_MEMORY_ITEMS,
+                    max_disk_bytes=CACHE_MAX_DISK_BYTES,
+                )
+    return _cache
+
+
+def cached_completion(client, model, messages, temperature=None, response_format=None,
+                      max_tokens=None, use_cache=True, lane="default", accept=None):
+    """
+    Run a chat completion through the response cache.
+
+    Args:
+        client (Groq): The Groq client used on a cache miss.
+        model (str): Model ID.
+        messages (list): Chat messages.
+        temperature (float): Sampling temperature (omitted from the request if None).
+        response_format (dict): Response format (omitted if None).
+        max_tokens (int): Completion token limit (omitted if None).
+        use_cache (bool): Set False to bypass the cache for this call.
+        lane (str): Scheduler priority lane on a cache miss: "interactive", "default" or "batch".
+        accept (callable): accept(text) -> bool; only accepted replies are cached, and a
+            cached reply that is not accepted is treated as a miss.
+
+    Returns:
+        str: The completion text.
+    """
+    key = make_cache_key(model, messages, temperature, response_format, max_tokens)
+    cache = get_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None and (accept is None or accept(cached)):
+            logger.info("LLM cache hit (%s) %s", model, cache.stats())
+            return cached
+        logger.info("LLM cache miss (%s) %s", model, cache.stats())
+
+    kwargs = {"model": model, "messages": messages}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+
+    completion = get_scheduler().run(
+        model, lambda: client.chat.completions.create(**kwargs), estimate_tokens(messages, max_tokens), lane
+    )
+    content = completion.choices[0].message.content
+
+    if cache is not None and content and (accept is None or accept(content)):
+        cache.set(key, content)
+    return content
+
+
+def stream_completion(client, model, messages, temperature=None, response_format=None,
+                      max_tokens=None, use_cache=True, lane="default"):
+    """
+    Stream a chat completion through the response cache.
+
+    Yields text deltas as they arrive. On a cache hit the cached text is yielded in
+    one piece; on a miss the fully assembled text is stored once the stream ends.
+
+    Args:
+        Same as cached_completion.
+
+    Yields:
+        str: Pieces of the completion text.
+    """
+    key = make_cache_key(model, messages, temperature, response_format, max_tokens)
+    cache = get_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info("LLM cache hit (%s, stream) %s", model, cache.stats())
+            yield cached
+            return
+        logger.info("LLM cache miss (%s, stream) %s", model, cache.stats())
+
+    kwargs = {"model": model, "messages": messages, "stream": True}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+
+    parts = []
+    # Only opening the stream is scheduled (and retried); a failure mid-stream propagates
+    stream = get_scheduler().run(
+        model, lambda: client.chat.completions.create(**kwargs), estimate_tokens(messages, max_tokens), lane
+    )
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        piece = chunk.choices[0].delta.content
+        if piece:
+            parts.append(piece)
+            yield piece
+
+    content = "".join(parts)
+    if cache is not None and content:
+        cache.set(key, content)
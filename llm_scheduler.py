@@ -0,0 +1,261 @@
+"""
+Process-wide scheduler for Groq requests.
+
+Every request that reaches the API (cache misses in llm_cache) is admitted through
+per-model token buckets for requests per minute and tokens per minute, so all
+sessions in the process share one budget instead of tripping the rate limit
+together. Waiting requests are admitted by priority lane (interactive before
+default before batch) and FIFO within a lane. Rate-limit (429), server (5xx),
+timeout and connection errors are retried with exponential backoff and full jitter.
+A retry-after header from the server takes precedence, and a 429 pauses the whole
+model, not just the request that hit it. Queue depth and retry counts are kept for
+display.
+
+Limits are configured with LLM_RPM / LLM_TPM (defaults for every model) and
+LLM_RATE_LIMITS="model=rpm/tpm,model=rpm/tpm" for per-model overrides.
+"""
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger("coach.llm_scheduler")
+
+DEFAULT_RPM = float(os.getenv("LLM_RPM", "30"))
+DEFAULT_TPM = float(os.getenv("LLM_TPM", "6000"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+# Completion tokens assumed for budgeting when a request sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 512
+
+LANES = {"interactive": 0, "default": 1, "batch": 2}
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def parse_rate_limits(spec):
+    """Parse "model=rpm/tpm,model=rpm/tpm" into {model: (rpm, tpm)}."""
+    limits = {}
+    for entry in spec.split(","):
+        if "=" not in entry:
+            continue
+        model, values = entry.split("=", 1)
+        rpm, _, tpm = values.partition("/")
+        limits[model.strip()] = (float(rpm), float(tpm or DEFAULT_TPM))
+    return limits
+
+
+class TokenBucket:
+    """A bucket of `capacity` units refilled at `capacity` per minute."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` units are available (a request above capacity waits for a full bucket)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+
+def _retry_after(error):
+    """Seconds the server asked us to wait (retry-after-ms / retry-after headers), or None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def is_retryable(error):
+    """True for rate limits, 5xx, timeouts and connection errors."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRY_STATUS or status >= 500
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class RequestScheduler:
+    """Rate limiting, priority admission and retries for LLM requests."""
+
+    def __init__(self, limits=None, default_rpm=DEFAULT_RPM, default_tpm=DEFAULT_TPM,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.limits = limits or {}
+        self.default_limits = (default_rpm, default_tpm)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._cond = threading.Condition()
+        self._buckets = {}
+        self._paused_until = {}
+        self._waiting = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._counts = Counter()
+        self._wait_seconds = 0.0
+
+    def _model_buckets(self, model):
+        if model not in self._buckets:
+            rpm, tpm = self.limits.get(model, self.default_limits)
+            self._buckets[model] = (TokenBucket(rpm), TokenBucket(tpm))
+        return self._buckets[model]
+
+    def _wait_time(self, ticket, tokens, now):
+        """0 if the ticket can be admitted now, seconds to sleep otherwise (None: wait for a notify)."""
+        _, _, model, _ = ticket
+        if any(other[2] == model and other < ticket for other in self._waiting):
+            return None
+        requests, token_bucket = self._model_buckets(model)
+        return max(
+            self._paused_until.get(model, 0.0) - now,
+            requests.wait_time(1, now),
+            token_bucket.wait_time(tokens, now),
+            0.0,
+        )
+
+    def _acquire(self, model, tokens, lane):
+        ticket = (LANES.get(lane, LANES["default"]), next(self._seq), model, lane)
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(ticket, tokens, now)
+                    if wait == 0:
+                        requests, token_bucket = self._model_buckets(model)
+                        requests.take(1, now)
+                        token_bucket.take(tokens, now)
+                        self._in_flight += 1
+                        break
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+            waited = time.monotonic() - start
+            self._counts["requests"] += 1
+            if waited > 0.05:
+                self._counts["throttled"] += 1
+                self._wait_seconds += waited
+        if waited > 1:
+            logger.info("Waited %.1fs for %s rate limit (%s lane)", waited, model, lane)
+
+    def _release(self, model, estimated, actual):
+        with self._cond:
+            self._in_flight -= 1
+            if actual is not None and actual < estimated:
+                self._model_buckets(model)[1].give_back(estimated - actual)
+            self._cond.notify_all()
+
+    def _pause(self, model, seconds):
+        with self._cond:
+            self._paused_until[model] = max(self._paused_until.get(model, 0.0), time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def backoff(self, attempt, error):
+        """Delay before retry number `attempt` (0-based): retry-after if given, else full jitter."""
+        server_delay = _retry_after(error)
+        if server_delay is not None:
+            return min(server_delay, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def run(self, model, call, tokens, lane="default"):
+        """
+        Run call() once admitted, retrying transient failures.
+
+        Args:
+            model (str): Model ID (rate limits are per model).
+            call (callable): Makes the request and returns the response.
+            tokens (int): Estimated prompt + completion tokens, for the TPM budget.
+            lane (str): "interactive", "default" or "batch".
+
+        Returns:
+            The response from call().
+        """
+        for attempt in range(self.max_retries + 1):
+            self._acquire(model, tokens, lane)
+            actual = None
+            try:
+                response = call()
+                usage = getattr(response, "usage", None)
+                actual = getattr(usage, "total_tokens", None)
+                return response
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    with self._cond:
+                        self._counts["failed"] += 1
+                    raise
+                error = e
+            finally:
+                self._release(model, tokens, actual)
+
+            delay = self.backoff(attempt, error)
+            rate_limited = getattr(error, "status_code", None) == 429
+            with self._cond:
+                self._counts["retries"] += 1
+                self._counts["rate_limited"] += rate_limited
+            logger.warning("%s on %s (attempt %d), retrying in %.1fs", type(error).__name__, model, attempt + 1, delay)
+            if rate_limited:
+                # Everyone waits, not just this request
+                self._pause(model, delay)
+            else:
+                time.sleep(delay)
+
+    def stats(self):
+        """Queue depth per lane, requests in flight, and request/retry counters."""
+        with self._cond:
+            depth = Counter(ticket[3] for ticket in self._waiting)
+            return {
+                "queued": {lane: depth.get(lane, 0) for lane in LANES},
+                "in_flight": self._in_flight,
+                "requests": self._counts["requests"],
+                "throttled": self._counts["throttled"],
+                "retries": self._counts["retries"],
+                "rate_limited": self._counts["rate_limited"],
+                "failed": self._counts["failed"],
+                "wait_seconds": round(self._wait_seconds, 1),
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide RequestScheduler."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler(limits=parse_rate_limits(os.getenv("LLM_RATE_LIMITS", "")))
+        return _scheduler
@@ -0,0 +1,139 @@
+"""
+Map-reduce analysis for long documents.
+
+Documents under MAP_REDUCE_THRESHOLD tokens are analysed with a single request. Longer
+ones are split into heading/sentence-aligned chunks, each chunk is analysed against the
+same instructions concurrently (map), and the partial results are merged with one
+reduce call. If the partial results are themselves too long for one request, they are
+reduced in groups first. Every call goes through the completion cache, so re-running an
+analysis on the same document only repeats the calls that changed.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+
+from llm_cache import cached_completion, stream_completion
+from text_utils import chunk_document, count_tokens
+
+logger = logging.getLogger("coach.map_reduce")
+
+# Documents above this many tokens are analysed with map-reduce
+MAP_REDUCE_THRESHOLD = int(os.getenv("MAP_REDUCE_THRESHOLD", "3000"))
+MAP_CHUNK_TOKENS = int(os.getenv("MAP_CHUNK_TOKENS", "2000"))
+MAP_OVERLAP_TOKENS = int(os.getenv("MAP_OVERLAP_TOKENS", "100"))
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "4"))
+MAP_MAX_TOKENS = int(os.getenv("MAP_MAX_TOKENS", "700"))
+# Partial results above this many tokens are reduced in groups before the final reduce
+REDUCE_INPUT_TOKENS = int(os.getenv("REDUCE_INPUT_TOKENS", "4000"))
+
+MAP_NOTE = (
+    "\n\nYou are seeing part {part} of {total} of a longer document. Analyse only what is in "
+    "this part and do not guess about the missing parts; they are analysed separately."
+)
+REDUCE_PROMPT = (
+    "The document was too long to analyse in one pass, so it was analysed in {total} parts. "
+    "Merge the partial analyses below into one final answer that follows the original "
+    "instructions and covers the whole document. Remove duplicates; something found in any "
+    "part counts for the whole document.{note}\n\n{partials}"
+)
+
+
+def _format_partials(partials):
+    return "\n\n".join(f"### Partial analysis {i}\n{p}" for i, p in enumerate(partials, 1))
+
+
+def _reduce_messages(system_prompt, partials, total, reduce_note):
+    note = f" {reduce_note}" if reduce_note else ""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": REDUCE_PROMPT.format(total=total, note=note, partials=_format_partials(partials))},
+    ]
+
+
+def _group_partials(partials, budget):
+    groups = [[]]
+    used = 0
+    for partial in partials:
+        tokens = count_tokens(partial)
+        if groups[-1] and used + tokens > budget:
+            groups.append([])
+            used = 0
+        groups[-1].append(partial)
+        used += tokens
+    return groups
+
+
+def analyze_document(client, model, system_prompt, build_prompt, text, reduce_note="",
+                     response_format=None, temperature=None, stream=False,
+                     threshold=MAP_REDUCE_THRESHOLD, chunk_tokens=MAP_CHUNK_TOKENS,
+                     max_workers=MAP_CONCURRENCY, on_progress=None, lane="default", accept=None):
+    """
+    Analyse a document with one request, or with map-reduce if it is long.
+
+    Args:
+        client (Groq): The Groq client.
+        model (str): Model ID.
+        system_prompt (str): The analysis instructions.
+        build_prompt (callable): build_prompt(text) -> user message for a document or chunk.
+        text (str): The document.
+        reduce_note (str): Extra instructions for merging partial results (e.g. the output format).
+        response_format (dict): Response format for every call (e.g. {"type": "json_object"}).
+        temperature (float): Sampling temperature.
+        stream (bool): Return a generator of text deltas for the final call instead of the text.
+        threshold (int): Token count above which map-reduce is used.
+        chunk_tokens (int): Target tokens per chunk.
+        max_workers (int): Concurrent map requests.
+        on_progress (callable): on_progress(done, total) after each map call, on the calling thread.
+        lane (str): Scheduler priority lane for every call.
+        accept (callable): accept(text) -> bool for the final answer; a rejected one is not
+            cached (see cached_completion). Ignored when streaming.
+
+    Returns:
+        str, or a generator of str if stream is True.
+    """
+    options = {"response_format": response_format, "temperature": temperature, "lane": lane}
+    complete = stream_completion if stream else partial(cached_completion, accept=accept)
+
+    chunks = None
+    if count_tokens(text) > threshold:
+        chunks = chunk_document(text, max_tokens=chunk_tokens, mode="heading", overlap_tokens=MAP_OVERLAP_TOKENS)
+    if not chunks or len(chunks) == 1:
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": build_prompt(text)},
+        ]
+        return complete(client, model=model, messages=messages, **options)
+
+    total = len(chunks)
+    logger.info("Map-reduce over %d chunks (%d tokens, %d workers)", total, count_tokens(text), max_workers)
+
+    def run_map(index, chunk):
+        messages = [
+            {"role": "system", "content": system_prompt + MAP_NOTE.format(part=index + 1, total=total)},
+            {"role": "user", "content": build_prompt(text[chunk.start:chunk.end])},
+        ]
+        return cached_completion(client, model=model, messages=messages, max_tokens=MAP_MAX_TOKENS, **options)
+
+    partials = [None] * total
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(run_map, i, chunk): i for i, chunk in enumerate(chunks)}
+        for done, future in enumerate(as_completed(futures), 1):
+            partials[futures[future]] = future.result()
+            if on_progress is not None:
+                on_progress(done, total)
+
+        # Reduce in groups until the partial results fit one request
+        while len(partials) > 1 and count_tokens("".join(partials)) > REDUCE_INPUT_TOKENS:
+            groups = _group_partials(partials, REDUCE_INPUT_TOKENS)
+            if len(groups) == len(partials):
+                break
+            partials = list(pool.map(
+                lambda group: cached_completion(
+                    client, model=model, messages=_reduce_messages(system_prompt, group, total, reduce_note),
+                    max_tokens=MAP_MAX_TOKENS, **options,
+                ),
+                groups,
+            ))
+
+    return complete(client, model=model, messages=_reduce_messages(system_prompt, partials, total, reduce_note), **options)
@@ -0,0 +1,175 @@
+"""
+OCR engines.
+
+TesseractEngine runs Tesseract in a reusable process pool, so pages are recognised on
+all cores instead of one at a time on the Streamlit script thread. Very tall images
+are tiled into horizontal bands, cut at blank rows so no text line is split, and the
+bands are recognised in parallel. Each result carries a mean word confidence (0-100)
+so callers can decide whether to escalate to Vision OCR.
+"""
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from tesseract_utils import find_tesseract
+
+OCRResult = namedtuple("OCRResult", ["text", "confidence", "engine"])
+
+OCR_PROCESS_WORKERS = int(os.getenv("OCR_PROCESS_WORKERS", str(os.cpu_count() or 2)))
+# Images taller than this are split into bands before recognition
+OCR_TILE_HEIGHT = int(os.getenv("OCR_TILE_HEIGHT", "3000"))
+# Mean word confidence below which a Tesseract result should be escalated to Vision OCR
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "70"))
+
+
+def _tesseract_worker(mode, size, raw, lang, cmd):
+    # Runs in a worker process: rebuild the image and return (text, confidences)
+    import pytesseract
+
+    pytesseract.pytesseract.tesseract_cmd = cmd
+    image = Image.frombytes(mode, size, raw)
+    data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+
+    lines = []
+    current_key = None
+    current_words = []
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        if not word.strip():
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        if key != current_key and current_words:
+            lines.append((current_key, " ".join(current_words)))
+            current_words = []
+        current_key = key
+        current_words.append(word)
+        conf = float(data["conf"][i])
+        if conf >= 0:
+            confidences.append(conf)
+    if current_words:
+        lines.append((current_key, " ".join(current_words)))
+
+    parts = []
+    previous = None
+    for key, line in lines:
+        # Blank line between paragraphs, newline between lines
+        if previous is not None and key[:2] != previous[:2]:
+            parts.append("\n")
+        parts.append(line)
+        parts.append("\n")
+        previous = key
+    return "".join(parts), confidences
+
+
+def split_into_bands(image, band_height=OCR_TILE_HEIGHT, search=200):
+    """
+    Split a tall image into horizontal bands, cutting at the brightest (blankest) row
+    within `search` pixels of each target boundary so text lines stay whole.
+
+    Returns:
+        list: PIL images, top to bottom.
+    """
+    if image.height <= band_height:
+        return [image]
+    gray = image.convert("L")
+    # One column wide: each pixel is the mean brightness of its row
+    profile = list(gray.resize((1, gray.height), Image.BOX).getdata())
+
+    bands = []
+    top = 0
+    while image.height - top > band_height:
+        target = top + band_height
+        lo, hi = max(top + 1, target - search), min(image.height - 1, target + search)
+        cut = max(range(lo, hi + 1), key=lambda row: profile[row])
+        bands.append(image.crop((0, top, image.width, cut)))
+        top = cut
+    bands.append(image.crop((0, top, image.width, image.height)))
+    return bands
+
+
+class TesseractEngine:
+    """Tesseract on a shared process pool (one pool per process, reused across requests)."""
+
+    name = "tesseract"
+
+    def __init__(self, workers=OCR_PROCESS_WORKERS, lang="eng", band_height=OCR_TILE_HEIGHT):
+        self.workers = workers
+        self.lang = lang
+        self.band_height = band_height
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def available(self):
+        return find_tesseract() is not None
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._pool
+
+    def recognize(self, images):
+        """
+        Recognise images in parallel.
+
+        Args:
+            images (list): PIL images.
+
+        Returns:
+            list: One OCRResult per image, in input order.
+        """
+        cmd = find_tesseract()
+        if cmd is None:
+            raise FileNotFoundError("Tesseract not installed")
+
+        pool = self._get_pool()
+        jobs = []  # (image index, future) for every band
+        for index, image in enumerate(images):
+            if image.mode not in ("L", "RGB"):
+                image = image.convert("RGB")
+            for band in split_into_bands(image, self.band_height):
+                jobs.append((index, pool.submit(_tesseract_worker, band.mode, band.size, band.tobytes(), self.lang, cmd)))
+
+        texts = [[] for _ in images]
+        confidences = [[] for _ in images]
+        for index, future in jobs:
+            text, confs = future.result()
+            texts[index].append(text)
+            confidences[index].extend(confs)
+
+        return [
+            OCRResult("".join(parts), (sum(confs) / len(confs)) if confs else 0.0, self.name)
+            for parts, confs in zip(texts, confidences)
+        ]
+
+    def recognize_one(self, image):
+        return self.recognize([image])[0]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_tesseract_engine = None
+
+
+def get_tesseract_engine():
+    """Return the process-wide Tesseract engine."""
+    global _tesseract_engine
+    if _tesseract_engine is None:
+        _tesseract_engine = TesseractEngine()
+    return _tesseract_engine
+
+
+def needs_escalation(result, min_confidence=OCR_MIN_CONFIDENCE):
+    """True if a local OCR result is too uncertain (or empty) to use without Vision OCR."""
+    return not result.text.strip() or result.confidence < min_confidence
@@ -1,14 +1,112 @@
 import streamlit as st
-import pytesseract
 from PIL import Image
 import os
-import json
-from dotenv import load_dotenv
-from groq import Groq
+import uuid
+from groq_client import get_groq_client
+from llm_cache import get_cache
+from llm_scheduler import get_scheduler
+from structured_output import structured_completion, StructuredOutputError
+from ai_display import stream_to_placeholder
+from doc_cache import get_document
+from doc_extract import extract_document, IMAGE_TYPES, DOCUMENT_TYPES, SUPPORTED_TYPES
+from tesseract_utils import find_tesseract
+from journal import get_journal
+from map_reduce import analyze_document
+from interview_grading import submit_grade, collect_grades, format_feedback
+from background_tasks import get_session_tasks
 
-def show_jd_interview():
-    load_dotenv()
+# Longest the feedback page waits for answers still being graded
+GRADE_WAIT_SECONDS = 120
+# Question counts generated in the background as soon as the JD text is stable
+SPECULATIVE_QUESTION_COUNTS = [int(n) for n in os.getenv("SPECULATIVE_QUESTION_COUNTS", "5,10").split(",") if n.strip()]
+
+
+def generate_questions(client, jd_text, num_questions):
+    """
+    Generate interview questions for a job description.
+
+    Returns:
+        list: Up to num_questions questions.
+
+    Raises:
+        StructuredOutputError: If no valid list of questions was returned, even after a retry.
+    """
+    question_prompt = f"""
+    Based on this job description, generate exactly {num_questions} interview questions:
+    {jd_text}
     
+    Return the questions as a JSON object: {{"questions": ["...", "..."]}}, without numbering.
+    Focus on technical skills, behavioral scenarios, and role-specific expertise.
+    """
+    schema = {
+        "type": "object",
+        "required": ["questions"],
+        "properties": {
+            "questions": {
+                "type": "array",
+                "items": {"type": "string", "minLength": 1},
+                "minItems": max(1, num_questions - 1),  # Allow slight variation
+                "maxItems": num_questions,
+            },
+        },
+    }
+    result = structured_completion(
+        client,
+        model="llama-3.1-8b-instant",
+        messages=[
+            {"role": "system", "content": "You are an expert technical recruiter."},
+            {"role": "user", "content": question_prompt}
+        ],
+        schema=schema,
+    )
+    return [q.strip() for q in result["questions"]]
+
+
+def ready_questions(tasks, jd_digest, num_questions):
+    """
+    Questions pre-generated in the background for this JD, if any have finished: the
+    exact count, else the first num_questions of the smallest larger set.
+    """
+    done = tasks.done_results(lambda key: key[0] == "questions" and key[1] == jd_digest)
+    for (_, _, count), questions in sorted(done.items(), key=lambda item: item[0][2]):
+        if count >= num_questions:
+            return questions[:num_questions]
+    return None
+
+
+def replay_interview(events):
+    """
+    Fold interview journal events into the interview's current state.
+
+    Events are {"type": "start", "jd_text", "questions"}, {"type": "answer", "index", "answer"},
+    {"type": "feedback", "text"}, {"type": "reset"} and {"type": "snapshot", "state"}
+    (written by compaction).
+    """
+    state = {"jd_text": "", "questions": [], "answers": [], "feedback": None}
+    for event in events:
+        kind = event.get("type")
+        if kind == "snapshot":
+            state = dict(event["state"])
+        elif kind == "start":
+            state = {"jd_text": event.get("jd_text", ""), "questions": event["questions"], "answers": [], "feedback": None}
+        elif kind == "answer":
+            # Keep answers positional even if an event was lost
+            answers = state["answers"][:event["index"]]
+            answers += [""] * (event["index"] - len(answers))
+            state["answers"] = answers + [event["answer"]]
+        elif kind == "feedback":
+            state["feedback"] = event["text"]
+        elif kind == "reset":
+            state = {"jd_text": state["jd_text"], "questions": [], "answers": [], "feedback": None}
+    return state
+
+
+def compact_interview(events):
+    """Compaction fold: replace the event history with a single snapshot."""
+    return [{"type": "snapshot", "state": replay_interview(events)}]
+
+
+def show_jd_interview():
     # ---------------- CONFIG ----------------
     # Page config is handled in app.py or implicitly. We don't set it here to avoid conflicts.
     
@@ -28,13 +126,18 @@ def show_jd_interview():
             if user_api_key and user_api_key != files_api_key:
                 os.environ["GROQ_API_KEY"] = user_api_key
                 # Optional: Update .env file if possible, but runtime env var is enough for session
+        cache_stats = get_cache().stats()
+        st.caption(f"⚡ Response cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+        queue_stats = get_scheduler().stats()
+        st.caption(f"🚦 LLM queue: {sum(queue_stats['queued'].values())} waiting, {queue_stats['in_flight']} in flight, {queue_stats['retries']} retries")
+        st.caption("🔤 Local OCR: " + ("Tesseract found" if find_tesseract() else "Tesseract not installed"))
     
     # Initialize Groq Client
     GROQ_API_KEY = user_api_key or os.getenv("GROQ_API_KEY")
     client = None
     if GROQ_API_KEY:
         try:
-            client = Groq(api_key=GROQ_API_KEY)
+            client = get_groq_client(GROQ_API_KEY)
         except Exception as e:
             st.sidebar.error(f"Invalid Key: {e}")
 
@@ -73,124 +176,36 @@ def show_jd_interview():
     if "jd_analysis" not in st.session_state:
         st.session_state.jd_analysis = ""
 
-    # ---------------- FUNCTIONS ----------------
-    # ---------------- FUNCTIONS ----------------
-    import base64
-    from io import BytesIO
-
-    def configure_tesseract():
-        """Attempt to find Tesseract executable in common Windows paths and user-provided directory."""
-        # 1. Check specific user path first (Recursive search in case it's a build dir)
-        user_path = r"C:\Users\B SUNIL KUMAR\Downloads\tesseract-main\tesseract-main"
-        if os.path.exists(user_path):
-            if os.path.isfile(user_path) and user_path.lower().endswith("tesseract.exe"):
-                 pytesseract.pytesseract.tesseract_cmd = user_path
-                 return True
-            # Recursive search for tesseract.exe within the user directory
-            for root, dirs, files in os.walk(user_path):
-                if "tesseract.exe" in files:
-                    found_path = os.path.join(root, "tesseract.exe")
-                    pytesseract.pytesseract.tesseract_cmd = found_path
-                    return True
-
-        # 2. Check common installation paths
-        common_paths = [
-            r"C:\Program Files\Tesseract-OCR\tesseract.exe",
-            r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
-            r"C:\Users\B SUNIL KUMAR\AppData\Local\Tesseract-OCR\tesseract.exe",
-            r"C:\Users\B SUNIL KUMAR\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
-        ]
-        for path in common_paths:
-            if os.path.exists(path):
-                pytesseract.pytesseract.tesseract_cmd = path
-                return True
-        return False
-
-    def encode_image(image):
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        buffered = BytesIO()
-        image.save(buffered, format="JPEG")
-        return base64.b64encode(buffered.getvalue()).decode('utf-8')
-
-    def extract_text_with_groq(image, client_instance):
-        """Use Groq Vision model to extract text. Supports 90b and 11b models."""
-        if not client_instance:
-             raise Exception("Groq API Key missing for Vision OCR.")
-        
-        base64_image = encode_image(image)
-        
-        # candidate models in order of preference (using exact IDs from user's access list)
-        candidate_models = [
-            "meta-llama/llama-4-scout-17b-16e-instruct",
-            "meta-llama/llama-4-maverick-17b-128e-instruct",
-            "llama-3.2-11b-vision-preview", # Keeping as fallback just in case
-        ]
-
-        last_exception = None
-        for model in candidate_models:
-            try:
-                completion = client_instance.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": "Extract all the text from this Job Description image exactly as it appears. Output ONLY the text content, no conversational filler."},
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}"
-                                    }
-                                }
-                            ]
-                        }
-                    ],
-                    temperature=0.0,
-                    max_tokens=2048
-                )
-                return completion.choices[0].message.content
-            except Exception as e:
-                last_exception = e
-                continue # Try next model
-        
-        # If all failed
-        raise last_exception
-
-    def extract_text_from_image(image):
-        # 1. Try Groq Vision First (Serverless, No Install, High Accuracy)
-        vision_key = os.getenv("GROQ_API_KEY")
-        if vision_key:
-             try:
-                 temp_client = Groq(api_key=vision_key)
-                 return extract_text_with_groq(image, temp_client)
-             except Exception as vision_error:
-                 if "401" in str(vision_error):
-                     st.warning("⚠️ Vision OCR Failed: Invalid API Key. Please update it in the Sidebar Settings.")
-                 else:
-                     st.warning(f"Vision OCR failed (Switching to Tesseract): {vision_error}")
-                 # Fall through to Tesseract
-        
-        # 2. Try Tesseract as Backup
-        try:
-            configure_tesseract()
-            return pytesseract.image_to_string(image, lang="eng")
-        except Exception:
-            raise Exception("OCR Failed: Groq Vision Model ineffective AND Tesseract not installed.\n\n👉 ACTION: Update your API Key in the Sidebar Settings, or use 'Paste Text' mode.")
-    
-    def parse_questions_list(text):
-        lines = text.split("\n")
-        questions = []
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            # Capture numbered or bulleted questions
-            if line[0].isdigit() or line.startswith("-"):
-                clean = line.lstrip("0123456789.- ").strip()
-                if clean:
-                    questions.append(clean)
-        return questions
+    # Interview transcripts are journaled, so a reload with ?iid=... resumes the interview
+    if "interview_id" not in st.session_state:
+        iid = st.query_params.get("iid")
+        if iid and get_journal("interview", iid).exists():
+            restored = replay_interview(get_journal("interview", iid).replay())
+            st.session_state.jd_text = st.session_state.jd_text or restored["jd_text"]
+            st.session_state.questions = restored["questions"]
+            st.session_state.answers = restored["answers"]
+            st.session_state.current_q = len(restored["answers"])
+            st.session_state.interview_active = bool(restored["questions"])
+            if restored["feedback"]:
+                st.session_state.feedback = restored["feedback"]
+        else:
+            iid = uuid.uuid4().hex
+        st.session_state.interview_id = iid
+    journal = get_journal("interview", st.session_state.interview_id)
+
+    def record_event(event):
+        journal.append(event)
+        journal.maybe_compact(compact_interview)
+
+    # Answers are graded in the background as they are submitted; the feedback step only aggregates
+    if "grade_futures" not in st.session_state:
+        st.session_state.grade_futures = {}
+
+    def start_grading(index, answer):
+        if client:
+            st.session_state.grade_futures[index] = submit_grade(
+                client, st.session_state.questions[index], answer, st.session_state.jd_text
+            )
 
     # ---------------- MAIN CONTENT ----------------
     st.markdown('<div class="glass-card">', unsafe_allow_html=True)
@@ -210,23 +225,23 @@ def show_jd_interview():
     if input_mode == "Upload Image":
         uploaded_file = st.file_uploader(
             "📎 Upload JD (Image, PDF, DOCX, JSON, TXT, etc.)",
-            type=["png", "jpg", "jpeg", "pdf", "docx", "doc", "txt", "json", "csv", "md", "html"],
+            type=SUPPORTED_TYPES,
             help="Supported: Images, PDF, Word, JSON, Text, CSV, Markdown"
         )
         if uploaded_file:
             file_type = uploaded_file.name.split('.')[-1].lower()
             
             # Check if it's an image or document
-            if file_type in ["png", "jpg", "jpeg"]:
+            if file_type in IMAGE_TYPES:
                 # Image processing with OCR
                 img = Image.open(uploaded_file)
                 st.image(img, caption="Target Document", use_container_width=True)
                 if st.button("🔍 Extract & Analyze JD", use_container_width=True):
                     with st.spinner("Extracting text from image..."):
                         try:
-                            extracted = extract_text_from_image(img)
-                            st.session_state.jd_text = extracted
-                            st.success("JD Extracted Successfully!")
+                            doc_info = get_document(uploaded_file.getvalue(), uploaded_file.name, extract_document)
+                            st.session_state.jd_text = doc_info["text"]
+                            st.success("JD Extracted Successfully!" + (" (cached)" if doc_info["cached"] else ""))
                         except Exception as e:
                             if "Tesseract" in str(e) or "OCR Failed" in str(e):
                                 st.warning("⚠️ Critical OCR Failure")
@@ -234,74 +249,28 @@ def show_jd_interview():
                             else:
                                 st.error(f"Analysis Error: {e}")
             
-            elif file_type in ["pdf", "docx", "doc", "txt", "json", "csv", "md", "html"]:
+            elif file_type in DOCUMENT_TYPES:
                 # Document processing (direct text extraction or OCR fallback)
                 st.info(f"📄 Document detected: {uploaded_file.name}")
                 if st.button("📖 Extract Text from Document", use_container_width=True):
                     with st.spinner("Processing document..."):
                         try:
-                            jd_text = ""
-                            
-                            # --- JSON Handling ---
-                            if file_type == "json":
-                                try:
-                                    import json
-                                    data = json.load(uploaded_file)
-                                    # Convert JSON to a readable string format
-                                    jd_text = json.dumps(data, indent=2)
-                                except Exception as e:
-                                    st.error(f"JSON Error: {e}")
-
-                            # --- PDF Handling (Text + OCR Fallback) ---
-                            elif file_type == "pdf":
-                                try:
-                                    import fitz  # PyMuPDF
-                                    
-                                    # Write bytes to temp file because fitz needs a filename or bytes stream
-                                    # fitz.open(stream=..., filetype="pdf") works
-                                    doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-                                    
-                                    for page_num, page in enumerate(doc):
-                                        text = page.get_text()
-                                        
-                                        # Check if page is likely scanned (very little text)
-                                        if len(text.strip()) < 50:
-                                            st.info(f"Page {page_num+1} appears scanned. Applying OCR...")
-                                            # Render page to image
-                                            pix = page.get_pixmap(dpi=200)
-                                            # Convert to PIL Image
-                                            img_data = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                                            # Use existing extraction function
-                                            text = extract_text_from_image(img_data)
-                                            jd_text += f"\n--- Page {page_num+1} (OCR) ---\n" + text
-                                        else:
-                                            jd_text += text
-                                            
-                                except ImportError:
-                                    st.error("PyMuPDF (fitz) is missing. Please ensure requirements.docx is installed.")
-                                except Exception as e:
-                                    st.error(f"PDF Error: {e}")
-
-                            # --- Word Document ---
-                            elif file_type in ["docx", "doc"]:
-                                try:
-                                    import docx
-                                    doc = docx.Document(uploaded_file)
-                                    for para in doc.paragraphs:
-                                        jd_text += para.text + "\n"
-                                except ImportError:
-                                    st.error("python-docx library is missing.")
-
-                            # --- Generic Text Handling (TXT, CSV, MD, HTML) ---
-                            else:
-                                try:
-                                    # Reset pointer just in case
-                                    uploaded_file.seek(0)
-                                    jd_text = uploaded_file.read().decode("utf-8")
-                                except Exception:
-                                    st.warning("Could not decode as UTF-8. Trying fallback encoding...")
-                                    uploaded_file.seek(0)
-                                    jd_text = uploaded_file.read().decode("latin-1")
+                            progress = st.progress(0.0, text="Reading document...")
+                            done_pages = []
+
+                            def report_page(page_num, total, method):
+                                done_pages.append(page_num)
+                                label = "OCR" if method == "ocr" else "text layer"
+                                progress.progress(len(done_pages) / total, text=f"Page {page_num+1} done ({label}) · {len(done_pages)}/{total}")
+
+                            # Parsed at most once per file: repeat uploads hit the shared extraction cache
+                            doc_info = get_document(
+                                uploaded_file.getvalue(),
+                                uploaded_file.name,
+                                lambda data, name: extract_document(data, name, on_page=report_page, warn=st.warning),
+                            )
+                            progress.empty()
+                            jd_text = doc_info["text"]
                             
                             # Final Check
                             if jd_text.strip():
@@ -326,33 +295,37 @@ def show_jd_interview():
     
     # ---------------- REVIEW & INTERVIEW SETUP ----------------
     if st.session_state.jd_text and not st.session_state.interview_active:
-        # Save to JSON whenever we have text
-        from text_utils import save_extracted_text_to_json, chunk_text_meaningfully
-        save_extracted_text_to_json(st.session_state.jd_text)
-        
-        # Create chunks
-        chunks = chunk_text_meaningfully(st.session_state.jd_text)
-        
-        # Update jd_text to reflect the segmented format (visual improvement)
-        # We join chunks with double newlines to separate them in the text area
-        formatted_text = "\n\n".join(chunks)
-        if formatted_text != st.session_state.jd_text:
-             st.session_state.jd_text = formatted_text
-             st.rerun() 
-        
+        from text_utils import save_extraction_artifact, chunk_spans, rechunk_spans, text_sha256
+
+        # Chunk boundaries as offsets; after an edit only the affected chunks are recomputed
+        jd_text = st.session_state.jd_text
+        previous = st.session_state.get("jd_chunks")
+        if previous is None:
+            spans = chunk_spans(jd_text)
+        elif previous["text"] != jd_text:
+            spans = rechunk_spans(previous["text"], previous["spans"], jd_text)
+        else:
+            spans = previous["spans"]
+        st.session_state.jd_chunks = {"text": jd_text, "spans": spans}
+
+        # Persist the extracted text once per distinct version, not on every rerun
+        if st.session_state.get("jd_artifact_text") != st.session_state.jd_text:
+            save_extraction_artifact(st.session_state.jd_text, st.session_state.interview_id)
+            st.session_state.jd_artifact_text = st.session_state.jd_text
+
         st.markdown('<div class="glass-card" style="margin-top: 2rem;">', unsafe_allow_html=True)
         
         # 1. Review Section
         st.markdown('### <span class="material-symbols-rounded" style="vertical-align: middle; margin-right: 8px; color: var(--electric-violet);">rate_review</span> Review & Edit Job Description', unsafe_allow_html=True)
         
         # Display Chunks
-        if chunks:
+        if spans:
              st.markdown("#### <span style='font-size: 0.9rem; color: #94A3B8;'>Processed Segments (Read-Only Preview)</span>", unsafe_allow_html=True)
-             for i, chunk in enumerate(chunks):
+             for i, (start, end) in enumerate(spans):
                  st.markdown(f"""
                  <div style="background: rgba(255, 255, 255, 0.05); padding: 1rem; border-radius: 8px; margin-bottom: 0.5rem; border-left: 3px solid var(--electric-violet); white-space: pre-wrap;">
                     <small style="color: #64748B; display: block; margin-bottom: 4px;">Segment {i+1}</small>
-                    <span style="color: #E2E8F0;">{chunk}</span>
+                    <span style="color: #E2E8F0;">{jd_text[start:end]}</span>
                  </div>
                  """, unsafe_allow_html=True)
                  
@@ -380,6 +353,16 @@ def show_jd_interview():
         if updated_jd != st.session_state.jd_text:
             st.session_state.jd_text = updated_jd
 
+        # Once the JD text survives a rerun unchanged, generate interview questions in the
+        # background so they are ready by the time the analysis is done
+        tasks = get_session_tasks(st.session_state)
+        jd_digest = text_sha256(st.session_state.jd_text)
+        if client and st.session_state.get("jd_stable_digest") == jd_digest:
+            tasks.discard(lambda key: key[0] == "questions" and key[1] != jd_digest)
+            for count in SPECULATIVE_QUESTION_COUNTS:
+                tasks.submit(("questions", jd_digest, count), generate_questions, client, st.session_state.jd_text, count)
+        st.session_state.jd_stable_digest = jd_digest
+
         st.markdown("---")
         
         # 2. Analysis Section
@@ -389,9 +372,10 @@ def show_jd_interview():
             if not client:
                 st.error("Groq API Key missing.")
             else:
-                with st.spinner("AI analyzing job requirements..."):
+                with st.status("AI analyzing job requirements...", expanded=True) as analysis_status:
                     try:
-                        analysis_prompt = f"""
+                        def analysis_prompt(jd_part):
+                            return f"""
                         Analyze the following Job Description and provide a structured summary in Markdown format.
                         Focus on:
                         1. Job Title & Role Summary
@@ -401,17 +385,27 @@ def show_jd_interview():
                         5. Key Benefits/Perks (if mentioned)
                         
                         Job Description:
-                        {st.session_state.jd_text}
+                        {jd_part}
                         """
-                        
-                        completion = client.chat.completions.create(
-                            messages=[{"role": "system", "content": "You are an expert HR Analyst."}, {"role": "user", "content": analysis_prompt}],
-                            model="llama-3.1-8b-instant"
+
+                        # Long JDs (or JD bundles) are analysed in parts concurrently, then merged
+                        chunks = analyze_document(
+                            client,
+                            model="llama-3.1-8b-instant",
+                            system_prompt="You are an expert HR Analyst.",
+                            build_prompt=analysis_prompt,
+                            text=st.session_state.jd_text,
+                            reduce_note="Keep the same structured Markdown summary format.",
+                            stream=True,
+                            on_progress=lambda done, total: analysis_status.update(label=f"Analyzing part {done} of {total}..."),
                         )
-                        st.session_state.jd_analysis = completion.choices[0].message.content
+                        # Show tokens live; the styled card below renders the final text
+                        st.session_state.jd_analysis = stream_to_placeholder(st.empty(), chunks)
                         st.session_state.interview_active = False # Reset interview state
+                        analysis_status.update(label="Analysis complete", state="complete", expanded=False)
                             
                     except Exception as e:
+                        analysis_status.update(label="Analysis failed", state="error")
                         st.error(f"Analysis Error: {e}")
 
         # Display Analysis Result
@@ -512,38 +506,24 @@ def show_jd_interview():
                     else:
                         with st.spinner(f"🤖 AI is generating {num_questions} interview questions..."):
                             try:
-                                # Generate Questions
-                                question_prompt = f"""
-                                Based on this job description, generate exactly {num_questions} interview questions:
-                                {st.session_state.jd_text}
-                                
-                                Return only the questions, one per line, numbered 1-{num_questions}.
-                                Focus on technical skills, behavioral scenarios, and role-specific expertise.
-                                """
-                                
-                                completion = client.chat.completions.create(
-                                    messages=[
-                                        {"role": "system", "content": "You are an expert technical recruiter."},
-                                        {"role": "user", "content": question_prompt}
-                                    ],
-                                    model="llama-3.1-8b-instant",
-                                )
-                                
-                                raw_questions = completion.choices[0].message.content
-                                # Parse questions (split by newline, clean up)
-                                questions = [q.strip() for q in raw_questions.split('\n') if q.strip() and any(c.isalpha() for c in q)]
-                                # Remove numbering if present
-                                questions = [q.split('.', 1)[-1].strip() if q[0].isdigit() else q for q in questions]
-                                
-                                if len(questions) >= num_questions - 1:  # Allow slight variation
-                                    st.session_state.questions = questions[:num_questions]
-                                    st.session_state.answers = []
-                                    st.session_state.current_q = 0
-                                    st.session_state.interview_active = True
-                                    st.rerun()
-                                else:
-                                    st.error("Failed to generate enough questions. Please try again.")
-                                    
+                                questions = ready_questions(tasks, jd_digest, num_questions)
+                                if questions is None:
+                                    # Not pre-generated (or still running): join or start the task
+                                    key = ("questions", jd_digest, num_questions)
+                                    questions = tasks.submit(key, generate_questions, client, st.session_state.jd_text, num_questions).result()
+
+                                st.session_state.questions = questions
+                                st.session_state.answers = []
+                                st.session_state.current_q = 0
+                                # Grades and feedback belong to the previous interview
+                                st.session_state.grade_futures = {}
+                                st.session_state.pop("feedback", None)
+                                st.session_state.interview_active = True
+                                record_event({"type": "start", "jd_text": st.session_state.jd_text, "questions": st.session_state.questions})
+                                st.query_params["iid"] = st.session_state.interview_id
+                                st.rerun()
+                            except StructuredOutputError:
+                                st.error("Failed to generate enough questions. Please try again.")
                             except Exception as e:
                                 st.error(f"Question Generation Error: {str(e)}")
                 
@@ -581,13 +561,17 @@ def show_jd_interview():
                     if not user_ans:
                         st.warning("Please type an answer.")
                     else:
+                        record_event({"type": "answer", "index": q_idx, "answer": user_ans})
                         st.session_state.answers.append(user_ans)
+                        start_grading(q_idx, user_ans)
                         st.session_state.current_q += 1
                         st.rerun()
             
             with col2:
                 if st.button("⏭️ Skip Question", use_container_width=True):
+                    record_event({"type": "answer", "index": q_idx, "answer": ""})
                     st.session_state.answers.append("")  # Record as skipped
+                    start_grading(q_idx, "")
                     st.session_state.current_q += 1
                     st.rerun()
         else:
@@ -634,60 +618,26 @@ def show_jd_interview():
             """, unsafe_allow_html=True)
             
             if "feedback" not in st.session_state:
-                 with st.spinner("AI evaluating your performance..."):
+                 with st.status("AI evaluating your performance...", expanded=True) as feedback_status:
                     try:
-                        qa_pairs = list(zip(st.session_state.questions, st.session_state.answers))
-                        feedback_prompt = f"""
-                        You are a Hard-Nosed Interview Evaluator. 
-                        
-                        🎯 OBJECTIVE: Evaluate the candidate's performance based ONLY on the User's Answers.
-                        
-                        User's Actual Answers (The ONLY Source of Truth):
-                        {qa_pairs}
-                        
-                        EVALUATION RULES:
-                        1. SCORING SYSTEM (2 Marks Per Question): 
-                           - Each individual question carries exactly 2 marks.
-                           - Every SKIPPED or EMPTY answer MUST result in exactly 0/2 marks.
-                           - Every ATTENDED answer must be scored from 0 to 2 (e.g., 0.5, 1.25, 2.0) based on how well it satisfies the requirement.
-                           - MAX POSSIBLE SCORE = (Number of Questions * 2).
-                        2. WEAKNESSES & GAPS: 
-                           - Explicitly list every SKIPPED question as a major weakness/gap (0/2 marks).
-                           - Explain that skipping critical questions significantly impacts the hiring decision.
-                        3. DEMONSTRATED STRENGTHS: 
-                           - Only extract strengths from questions the user actually ATTENDED.
-                           - Show the mark awarded (e.g., 1.8/2) for each strength found.
-                        4. NO ASSUMPTIONS: Do not grant marks for skills listed in the JD unless explicitly proved in an attended answer.
-                        
-                        Evaluation Format (Markdown):
-                        ### **Overall performance Score**: [Total Marks Obtained] / [Max Possible Marks]
-                        
-                        #### **Score Breakdown**:
-                        - Q1: [Score]/2
-                        - Q2: [Score]/2
-                        ... (for all questions)
-                        
-                        #### **Demonstrated Strengths (Attended Questions)**:
-                        - [Strength description] (Evidence: [citation])
-                        
-                        #### **Gaps & Weaknesses (Skipped & Poor Answers)**:
-                        - **Skipped Question [N]**: Major Gap - No evidence provided (0/2 Marks)
-                        - [Other weaknesses]
-                        
-                        #### **Final Verdict**:
-                        [Strict hiring decision based ONLY on the total marks and evidence]
-                        """
-                        
-                        completion = client.chat.completions.create(
-                            messages=[
-                                {"role": "system", "content": "You are a strictly objective auditor. You categorize skips as weaknesses and attended answers as potential strengths. You judge only what is written."},
-                                {"role": "user", "content": feedback_prompt}
-                            ],
-                            model="llama-3.1-8b-instant",
-                        )
-                        
-                        st.session_state.feedback = completion.choices[0].message.content
+                        if not client:
+                            raise RuntimeError("Groq API Key not found! Please check .env file.")
+                        futures = st.session_state.grade_futures
+                        # Answers restored from the journal (or given before a key was set) are graded now
+                        for i, answer in enumerate(st.session_state.answers):
+                            if i not in futures:
+                                start_grading(i, answer)
+                        pending = sum(1 for f in futures.values() if not f.done())
+                        if pending:
+                            feedback_status.update(label=f"Waiting for {pending} answer(s) still being graded...")
+                        grades = collect_grades(futures, len(st.session_state.questions), timeout=GRADE_WAIT_SECONDS)
+                        st.session_state.feedback = format_feedback(st.session_state.questions, grades)
+                        record_event({"type": "feedback", "text": st.session_state.feedback})
+                        # The interview is complete: fold it into one snapshot (this also closes the file)
+                        journal.compact(compact_interview)
+                        feedback_status.update(label="Evaluation complete", state="complete", expanded=False)
                     except Exception as e:
+                        feedback_status.update(label="Evaluation failed", state="error")
                         st.error(f"Feedback Error: {str(e)}")
             
             if "feedback" in st.session_state:
@@ -699,10 +649,13 @@ def show_jd_interview():
             
             st.markdown("<br>", unsafe_allow_html=True)
             if st.button("🔄 Start New Interview"):
+                 record_event({"type": "reset"})
+                 journal.compact(compact_interview)
                  st.session_state.interview_active = False
                  st.session_state.questions = []
                  st.session_state.answers = []
                  st.session_state.current_q = 0
+                 st.session_state.grade_futures = {}
                  if "feedback" in st.session_state:
                      del st.session_state.feedback
                  st.rerun()
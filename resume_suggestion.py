@@ -1,18 +1,16 @@
 import streamlit as st
-import os
-from dotenv import load_dotenv
-from groq import Groq
-from io import BytesIO
+from groq_client import get_groq_client
+from llm_cache import stream_completion
+from ai_display import stream_to_placeholder
+from doc_cache import get_document
+from doc_extract import extract_document
+from chat_context import build_context, fit_text
+from map_reduce import analyze_document
 
-try:
-    import PyPDF2
-except ImportError:
-    st.error("PyPDF2 library not found. Please run `pip install PyPDF2`")
-    PyPDF2 = None
+# Token cap for the resume embedded in the chat system prompt
+RESUME_CONTEXT_TOKENS = 2500
 
 def show_resume_suggestion():
-    load_dotenv()
-    
     # Page configuration
     st.set_page_config(page_title="Resume Optimizer - Deep Cosmos", page_icon="📝", layout="wide")
 
@@ -25,13 +23,11 @@ def show_resume_suggestion():
         st.session_state.resume_chat_history = []
     
     # Initialize Groq Client
-    GROQ_API_KEY = os.getenv("GROQ_API_KEY")
     client = None
-    if GROQ_API_KEY:
-        try:
-            client = Groq(api_key=GROQ_API_KEY)
-        except Exception as e:
-            st.error(f"Error initializing Groq client: {e}")
+    try:
+        client = get_groq_client()
+    except Exception as e:
+        st.error(f"Error initializing Groq client: {e}")
 
     # ---------------- HEADER ----------------
     col_head1, col_head2 = st.columns([8, 2])
@@ -101,45 +97,21 @@ def show_resume_suggestion():
                 else:
                     with st.spinner("AI Auditor at work..."):
                         try:
-                            resume_text = ""
-                            file_type = uploaded_file.name.split('.')[-1].lower()
-                            
-                            # Extract text based on file type
-                            if file_type == "pdf":
-                                if not PyPDF2:
-                                    st.error("PyPDF2 library is missing. Run: `pip install PyPDF2`")
-                                else:
-                                    pdf_reader = PyPDF2.PdfReader(uploaded_file)
-                                    for page in pdf_reader.pages:
-                                        resume_text += page.extract_text()
-                            
-                            elif file_type == "txt":
-                                # Read text file directly
-                                resume_text = uploaded_file.read().decode("utf-8")
-                            
-                            elif file_type in ["docx", "doc"]:
-                                try:
-                                    import docx
-                                    doc = docx.Document(uploaded_file)
-                                    for para in doc.paragraphs:
-                                        resume_text += para.text + "\n"
-                                except ImportError:
-                                    st.error("python-docx library is missing. Run: `pip install python-docx`")
-                                except Exception as e:
-                                    st.error(f"Error reading DOCX file: {str(e)}")
+                            # Parsed once per file; the ATS and JD pages share the same cache
+                            resume_text = get_document(uploaded_file.getvalue(), uploaded_file.name, extract_document)["text"]
                             
                             if resume_text.strip():
                                 st.session_state.resume_text = resume_text
                                 
-                                # AI Analysis
-                                completion = client.chat.completions.create(
-                                    messages=[
-                                        {"role": "system", "content": "You are an expert Resume Reviewer and Career Coach. Audit the following resume text. Provide a score out of 100, list top strengths, list weaknesses, and provide 3 concrete improvement suggestions. Format output in clean Markdown."},
-                                        {"role": "user", "content": resume_text}
-                                    ],
+                                # AI Analysis (long resumes are analysed in parts, then merged)
+                                st.session_state.resume_analysis = analyze_document(
+                                    client,
                                     model="llama-3.1-8b-instant",
+                                    system_prompt="You are an expert Resume Reviewer and Career Coach. Audit the following resume text. Provide a score out of 100, list top strengths, list weaknesses, and provide 3 concrete improvement suggestions. Format output in clean Markdown.",
+                                    build_prompt=lambda resume: resume,
+                                    text=resume_text,
+                                    reduce_note="Give a single score out of 100 for the whole resume.",
                                 )
-                            st.session_state.resume_analysis = completion.choices[0].message.content
                             st.success("Report Generated")
                         except Exception as e:
                             st.error(f"Error processing resume: {str(e)}")
@@ -252,42 +224,54 @@ def show_resume_suggestion():
         st.markdown('### <span class="material-symbols-rounded" style="vertical-align: middle; margin-right: 8px; color: var(--nebula-violet);">forum</span> Chat with Resume AI', unsafe_allow_html=True)
         st.markdown("<div style='margin-bottom: 1.5rem; color: #C7D2FE; font-size: 0.95rem;'>💬 Ask questions to improve your resume sections, rephrase bullets, or get career advice.</div>", unsafe_allow_html=True)
         
-        # Display chat history
-        for msg in st.session_state.resume_chat_history:
-            role_color = "#8B42C4" if msg["role"] == "user" else "#06B6D4"
-            align = "flex-end" if msg["role"] == "user" else "flex-start"
-            
-            st.markdown(f"""
+        def chat_bubble(role, content):
+            role_color = "#8B42C4" if role == "user" else "#06B6D4"
+            align = "flex-end" if role == "user" else "flex-start"
+            return f"""
                 <div class="chat-message" style="display: flex; justify-content: {align};">
                     <div style="background: {role_color}30; padding: 1rem 1.25rem; border-radius: 18px; max-width: 75%; border: 1px solid {role_color}50; color: white; box-shadow: 0 4px 12px rgba(0,0,0,0.2);">
-                        {msg["content"]}
+                        {content}
                     </div>
                 </div>
-            """, unsafe_allow_html=True)
+            """
+
+        # Display chat history
+        for msg in st.session_state.resume_chat_history:
+            st.markdown(chat_bubble(msg["role"], msg["content"]), unsafe_allow_html=True)
+
+        # Stream the reply to a question submitted by handle_chat on the previous run; it
+        # stays pending until the reply is in the history, so a failed request is retried
+        pending = st.session_state.get("resume_chat_pending")
+        if pending and client:
+            st.markdown(chat_bubble("user", pending), unsafe_allow_html=True)
+            try:
+                resume_context = fit_text(st.session_state.resume_text, RESUME_CONTEXT_TOKENS)
+                context_messages = build_context(
+                    client,
+                    "llama-3.1-8b-instant",
+                    f"You are an expert Resume Coach. Here is the user's resume:\n\n{resume_context}\n\nProvide specific, actionable advice.",
+                    st.session_state.resume_chat_history + [{"role": "user", "content": pending}],
+                    state=st.session_state.setdefault("resume_chat_summary", {}),
+                )
+                chunks = stream_completion(
+                    client,
+                    messages=context_messages,
+                    model="llama-3.1-8b-instant",
+                )
+                response = stream_to_placeholder(st.empty(), chunks, render=lambda text: chat_bubble("assistant", text))
+                st.session_state.resume_chat_history.append({"role": "user", "content": pending})
+                st.session_state.resume_chat_history.append({"role": "assistant", "content": response})
+                del st.session_state.resume_chat_pending
+                st.rerun()
+            except Exception as e:
+                st.error(f"Chat Error: {str(e)}")
 
-        # Chat Input Handler
+        # Chat Input Handler (widget callbacks cannot render, so the reply streams on the next run)
         def handle_chat():
             user_input = st.session_state.get("resume_chat_input", "").strip()
             if user_input and client:
-                st.session_state.resume_chat_history.append({"role": "user", "content": user_input})
-                
-                try:
-                    context_messages = [
-                        {"role": "system", "content": f"You are an expert Resume Coach. Here is the user's resume:\n\n{st.session_state.resume_text}\n\nProvide specific, actionable advice."},
-                        *st.session_state.resume_chat_history
-                    ]
-                    
-                    completion = client.chat.completions.create(
-                        messages=context_messages,
-                        model="llama-3.1-8b-instant",
-                    )
-                    
-                    response = completion.choices[0].message.content
-                    st.session_state.resume_chat_history.append({"role": "assistant", "content": response})
-                    st.session_state.resume_chat_input = ""  # Clear input
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Chat Error: {str(e)}")
+                st.session_state.resume_chat_pending = user_input
+                st.session_state.resume_chat_input = ""  # Clear input
 
         # Premium Pill Input
         st.text_input(
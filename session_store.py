@@ -0,0 +1,219 @@
+"""
+Persistent chat session store backed by SQLite (WAL mode).
+
+Sessions and messages are stored as rows, so appending a message is a single insert
+instead of rewriting one JSON document holding every session, and concurrent
+Streamlit sessions no longer overwrite each other's writes. The first time the store
+is opened, sessions from the legacy coach_v2_data.json file are migrated in.
+"""
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+DB_PATH = os.getenv("COACH_DB_PATH", "coach_v2_data.sqlite")
+LEGACY_JSON_PATH = "coach_v2_data.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _now():
+    return str(datetime.now())
+
+
+def default_title():
+    """Session title in the legacy format, e.g. 'Interview Prep Jan 10, 15:07'."""
+    return f"Interview Prep {datetime.now().strftime('%b %d, %H:%M')}"
+
+
+class SessionStore:
+    """Chat sessions and their messages in SQLite. Safe to share across threads."""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _conn(self):
+        # One connection per thread; WAL lets readers run alongside a writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def create_session(self, title=None, session_id=None):
+        """Create an empty session and return its ID."""
+        session_id = session_id or str(uuid.uuid4())
+        now = _now()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO sessions (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (session_id, title or default_title(), now, now),
+            )
+        return session_id
+
+    def get_session(self, session_id):
+        """Return a session's metadata as a dict, or None."""
+        row = self._conn().execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_sessions(self, limit=20, offset=0, include_empty=False):
+        """
+        List sessions, most recently updated first.
+
+        Args:
+            limit (int): Page size.
+            offset (int): Number of sessions to skip.
+            include_empty (bool): Include sessions without messages.
+
+        Returns:
+            list: Session dicts (id, title, created_at, updated_at, message_count).
+        """
+        where = "" if include_empty else "WHERE message_count > 0"
+        rows = self._conn().execute(
+            f"SELECT * FROM sessions {where} ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_messages(self, session_id):
+        """Return a session's messages as [{"role", "content"}], oldest first."""
+        rows = self._conn().execute(
+            "SELECT role, content FROM messages WHERE session_id = ? ORDER BY id",
+            (session_id,),
+        ).fetchall()
+        return [{"role": row["role"], "content": row["content"]} for row in rows]
+
+    def append_message(self, session_id, role, content):
+        """Append one message to a session (one insert plus a counter update)."""
+        now = _now()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                (session_id, role, content, now),
+            )
+            conn.execute(
+                "UPDATE sessions SET message_count = message_count + 1, updated_at = ? WHERE id = ?",
+                (now, session_id),
+            )
+
+    def rename_session(self, session_id, title):
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE sessions SET title = ? WHERE id = ?", (title, session_id))
+
+    def delete_session(self, session_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def prune_empty_sessions(self, keep=()):
+        """
+        Delete sessions that have no messages.
+
+        Args:
+            keep (iterable): Session IDs to keep even if empty (e.g. the one currently open).
+
+        Returns:
+            int: Number of sessions deleted.
+        """
+        keep = list(keep)
+        placeholders = ",".join("?" for _ in keep)
+        query = "DELETE FROM sessions WHERE message_count = 0"
+        if keep:
+            query += f" AND id NOT IN ({placeholders})"
+        conn = self._conn()
+        with conn:
+            return conn.execute(query, keep).rowcount
+
+    def migrate_from_json(self, json_path=LEGACY_JSON_PATH):
+        """
+        One-shot import of sessions from the legacy whole-file JSON store.
+
+        Runs at most once per database; existing session IDs are left untouched and
+        sessions without messages are skipped.
+
+        Returns:
+            int: Number of sessions imported.
+        """
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return 0
+        if not os.path.exists(json_path):
+            return 0
+
+        with open(json_path, "r", encoding="utf-8") as f:
+            sessions = json.load(f).get("sessions", {})
+
+        imported = 0
+        with conn:
+            for session_id, session in sessions.items():
+                messages = session.get("messages", [])
+                if not messages:
+                    continue
+                created_at = session.get("created_at") or _now()
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO sessions (id, title, created_at, updated_at, message_count) VALUES (?, ?, ?, ?, ?)",
+                    (session_id, session.get("title") or default_title(), created_at, created_at, len(messages)),
+                )
+                if cur.rowcount == 0:
+                    continue
+                conn.executemany(
+                    "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                    [(session_id, m.get("role", "user"), m.get("content", ""), created_at) for m in messages],
+                )
+                imported += 1
+            conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (_now(),))
+        return imported
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """
+    Return the process-wide session store. On first use the legacy JSON file is
+    migrated and sessions left empty (e.g. by an earlier migration) are pruned.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = SessionStore()
+                store.migrate_from_json()
+                store.prune_empty_sessions()
+                _store = store
+    return _store
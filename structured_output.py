@@ -0,0 +1,353 @@
+"""
+Structured (JSON) output for LLM calls.
+
+Replies are requested in JSON mode with the expected schema spelled out in the prompt,
+then checked with a small validator that covers the JSON Schema subset used here
+(type, properties, required, items, enum, minimum/maximum, minItems/maxItems,
+minLength). A failing reply is first repaired locally: code fences, surrounding prose,
+single quotes, Python literals, trailing commas, raw newlines in strings and truncated
+output are all fixed without another request. Harmless type mismatches, such as "85"
+for an integer, are coerced. Only a reply that is still invalid is retried, and the
+retry is targeted: the model sees its own reply and the validation errors rather than
+generating from scratch.
+"""
+import json
+import logging
+import math
+import re
+import threading
+from collections import Counter
+
+from llm_cache import cached_completion
+
+logger = logging.getLogger("coach.structured_output")
+
+STRUCTURED_RETRIES = 1
+REPAIR_SYSTEM_PROMPT = "You fix malformed JSON. Return valid JSON only, with no commentary."
+
+_FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*\n?|\n?\s*```\s*$")
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+class StructuredOutputError(ValueError):
+    """A reply that could not be parsed or validated, even after repair."""
+
+    def __init__(self, message, text="", errors=()):
+        super().__init__(message)
+        self.text = text
+        self.errors = list(errors)
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def stats():
+    """Counts of replies that were valid, repaired locally, retried, or failed."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _drop_trailing_comma(out):
+    end = len(out)
+    while end and out[end - 1].isspace():
+        end -= 1
+    if end and out[end - 1] == ",":
+        del out[end - 1]
+
+
+def repair_json(text):
+    """
+    Rewrite near-valid JSON into valid JSON where possible.
+
+    Handles code fences, prose around the JSON value, single-quoted strings, Python
+    True/False/None, trailing commas, raw control characters inside strings and output
+    cut off mid-value (open strings, arrays and objects are closed).
+    """
+    text = _FENCE_RE.sub("", text.strip())
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if starts:
+        text = text[min(starts):]
+
+    out = []
+    stack = []
+    quote = None
+    i = 0
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if quote:
+            if c == "\\" and i + 1 < n:
+                out.append("'" if text[i + 1] == "'" else c + text[i + 1])
+                i += 2
+                continue
+            if c == quote:
+                out.append('"')
+                quote = None
+            elif c == '"':
+                out.append('\\"')
+            elif c == "\n":
+                out.append("\\n")
+            elif c == "\t":
+                out.append("\\t")
+            elif c != "\r":
+                out.append(c)
+            i += 1
+            continue
+
+        if c in "\"'":
+            quote = c
+            out.append('"')
+        elif c in "{[":
+            stack.append("}" if c == "{" else "]")
+            out.append(c)
+        elif c in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(c)
+            if not stack:
+                break  # ignore anything after the top-level value
+        elif c.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(c)
+        i += 1
+
+    if quote:
+        out.append('"')
+    if stack:
+        tail = "".join(out).rstrip()
+        if tail.endswith(":"):
+            out.append(" null")
+    while stack:
+        _drop_trailing_comma(out)
+        out.append(stack.pop())
+    return "".join(out)
+
+
+def loads_lenient(text):
+    """
+    json.loads with a local repair pass for near-valid replies.
+
+    Raises:
+        ValueError: If the text is not JSON even after repair.
+    """
+    if not isinstance(text, str):
+        raise ValueError("Reply is not text")
+    try:
+        return json.loads(text)
+    except ValueError:
+        return json.loads(repair_json(text))
+
+
+def _coerce(value, schema):
+    """Apply harmless coercions (numeric strings, integral floats, null for optional strings)."""
+    kind = schema.get("type")
+    if kind in ("integer", "number") and isinstance(value, str):
+        try:
+            value = float(value.strip().rstrip("%"))
+        except ValueError:
+            return value
+    if kind == "integer" and isinstance(value, float) and math.isfinite(value):
+        return int(round(value))
+    if kind == "number" and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if kind == "string" and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+}
+
+
+def conform(value, schema, path="$"):
+    """
+    Validate a value against a schema, coercing where harmless.
+
+    Returns:
+        tuple: (value, errors) - the possibly coerced value and a list of error strings
+            (empty if the value is valid).
+    """
+    value = _coerce(value, schema)
+    kind = schema.get("type")
+    if kind in ("integer", "number") and isinstance(value, float) and not math.isfinite(value):
+        # NaN compares false with everything, so it would pass minimum/maximum
+        return value, [f"{path}: must be a finite number"]
+    if kind and (not isinstance(value, _TYPES[kind]) or (kind != "boolean" and isinstance(value, bool))):
+        return value, [f"{path}: expected {kind}, got {type(value).__name__}"]
+
+    errors = []
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: must be one of {schema['enum']}")
+    if kind in ("integer", "number"):
+        if "minimum" in schema and value < schema["minimum"]:
+            errors.append(f"{path}: must be >= {schema['minimum']}")
+        if "maximum" in schema and value > schema["maximum"]:
+            errors.append(f"{path}: must be <= {schema['maximum']}")
+    elif kind == "string":
+        if len(value.strip()) < schema.get("minLength", 0):
+            errors.append(f"{path}: must not be empty")
+    elif kind == "array":
+        if len(value) < schema.get("minItems", 0):
+            errors.append(f"{path}: needs at least {schema['minItems']} items, got {len(value)}")
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            value = value[:schema["maxItems"]]
+        if "items" in schema:
+            items = []
+            for i, item in enumerate(value):
+                item, item_errors = conform(item, schema["items"], f"{path}[{i}]")
+                items.append(item)
+                errors += item_errors
+            value = items
+    elif kind == "object":
+        value = dict(value)
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}: missing required key '{key}'")
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in value:
+                value[key], key_errors = conform(value[key], sub_schema, f"{path}.{key}")
+                errors += key_errors
+    return value, errors
+
+
+def schema_instructions(schema):
+    """Prompt text asking for JSON that matches the schema."""
+    return f"Return valid JSON only, matching this JSON Schema:\n{json.dumps(schema)}"
+
+
+def parse_structured(text, schema):
+    """
+    Parse and validate a reply, repairing it locally if needed.
+
+    Returns:
+        The validated (and coerced) value.
+
+    Raises:
+        StructuredOutputError: With .errors listing what is still wrong.
+    """
+    try:
+        value = json.loads(text)
+        repaired = False
+    except (TypeError, ValueError):
+        try:
+            value = loads_lenient(text)
+        except ValueError as e:
+            raise StructuredOutputError("Reply is not JSON", text, [f"$: not valid JSON ({e})"])
+        repaired = True
+    value, errors = conform(value, schema)
+    if errors:
+        raise StructuredOutputError("Reply does not match the schema", text, errors)
+    _count("repaired" if repaired else "valid")
+    return value
+
+
+def is_valid(text, schema):
+    """True if the reply parses (after local repair) and matches the schema."""
+    try:
+        return not conform(loads_lenient(text), schema)[1]
+    except ValueError:
+        return False
+
+
+def _retry_note(errors):
+    return (
+        "Your reply did not match the required format:\n- " + "\n- ".join(errors[:10])
+        + "\nReply again with the corrected JSON only."
+    )
+
+
+def structured_completion(client, model, messages, schema, retries=STRUCTURED_RETRIES, temperature=None,
+                          max_tokens=None):
+    """
+    Run a JSON-mode completion and return the validated value.
+
+    The schema instructions are appended to the system message. An invalid reply is
+    repaired locally; if that fails, the model is asked to correct its own reply
+    (with the validation errors), up to `retries` times. Only a first reply that passes
+    validation is cached; retries bypass the cache, so asking again after a failure
+    makes fresh requests instead of replaying the bad replies.
+
+    Args:
+        client (Groq): The Groq client.
+        model (str): Model ID.
+        messages (list): Chat messages; the first should be the system message.
+        schema (dict): The expected JSON Schema.
+        retries (int): Targeted retries after a reply fails validation.
+        temperature (float): Sampling temperature.
+        max_tokens (int): Completion token limit.
+
+    Returns:
+        The validated value.
+
+    Raises:
+        StructuredOutputError: If no valid reply was obtained.
+    """
+    messages = [dict(m) for m in messages]
+    if messages and messages[0]["role"] == "system":
+        messages[0]["content"] += "\n\n" + schema_instructions(schema)
+    else:
+        messages.insert(0, {"role": "system", "content": schema_instructions(schema)})
+
+    options = {"response_format": {"type": "json_object"}, "temperature": temperature, "max_tokens": max_tokens}
+    reply = cached_completion(
+        client, model=model, messages=messages, accept=lambda text: is_valid(text, schema), **options
+    )
+    for attempt in range(retries + 1):
+        try:
+            return parse_structured(reply, schema)
+        except StructuredOutputError as e:
+            if attempt == retries:
+                _count("failed")
+                raise
+            _count("retried")
+            logger.info("Structured reply invalid (%s); retrying", "; ".join(e.errors[:3]))
+            messages = messages + [
+                {"role": "assistant", "content": reply or ""},
+                {"role": "user", "content": _retry_note(e.errors)},
+            ]
+            reply = cached_completion(client, model=model, messages=messages, use_cache=False, **options)
+
+
+def parse_or_repair(client, model, text, schema):
+    """
+    Validate a reply produced elsewhere (e.g. by a map-reduce analysis); if local repair
+    is not enough, ask the model to fix just the reply, without resending the inputs.
+
+    Raises:
+        StructuredOutputError: If the reply could not be fixed.
+    """
+    try:
+        return parse_structured(text, schema)
+    except StructuredOutputError as e:
+        _count("retried")
+        logger.info("Structured reply invalid (%s); asking for a fix", "; ".join(e.errors[:3]))
+        messages = [
+            {"role": "system", "content": REPAIR_SYSTEM_PROMPT + "\n\n" + schema_instructions(schema)},
+            {"role": "user", "content": f"{_retry_note(e.errors)}\n\nReply to fix:\n{text}"},
+        ]
+        fixed = cached_completion(
+            client, model=model, messages=messages, response_format={"type": "json_object"}, use_cache=False
+        )
+        try:
+            return parse_structured(fixed, schema)
+        except StructuredOutputError:
+            _count("failed")
+            raise
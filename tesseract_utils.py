@@ -0,0 +1,101 @@
+"""
+Tesseract binary discovery, resolved once per process.
+
+Lookup order: the TESSERACT_CMD environment variable, `tesseract` on PATH, then the
+known Windows install locations (including a recursive search of a local build
+directory). The result is cached, including "not found", so OCR fallbacks on a
+multi-page document do not repeat the search per page.
+"""
+import os
+import shutil
+import subprocess
+import threading
+
+# Local build directory searched recursively for tesseract.exe
+USER_BUILD_DIR = r"C:\Users\B SUNIL KUMAR\Downloads\tesseract-main\tesseract-main"
+
+# Common installation paths
+COMMON_PATHS = [
+    r"C:\Program Files\Tesseract-OCR\tesseract.exe",
+    r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
+    r"C:\Users\B SUNIL KUMAR\AppData\Local\Tesseract-OCR\tesseract.exe",
+    r"C:\Users\B SUNIL KUMAR\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
+]
+
+_UNRESOLVED = object()
+_tesseract_cmd = _UNRESOLVED
+_lock = threading.Lock()
+
+
+def _search_build_dir(path):
+    if not os.path.exists(path):
+        return None
+    if os.path.isfile(path) and path.lower().endswith("tesseract.exe"):
+        return path
+    for root, dirs, files in os.walk(path):
+        if "tesseract.exe" in files:
+            return os.path.join(root, "tesseract.exe")
+    return None
+
+
+def _discover():
+    env_cmd = os.getenv("TESSERACT_CMD")
+    if env_cmd and os.path.isfile(env_cmd):
+        return env_cmd
+
+    on_path = shutil.which("tesseract")
+    if on_path:
+        return on_path
+
+    found = _search_build_dir(USER_BUILD_DIR)
+    if found:
+        return found
+
+    for path in COMMON_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def find_tesseract(refresh=False):
+    """
+    Return the Tesseract executable path, or None if it is not installed.
+
+    Args:
+        refresh (bool): Discard the cached result (e.g. after installing Tesseract).
+    """
+    global _tesseract_cmd
+    if refresh or _tesseract_cmd is _UNRESOLVED:
+        with _lock:
+            if refresh or _tesseract_cmd is _UNRESOLVED:
+                _tesseract_cmd = _discover()
+    return _tesseract_cmd
+
+
+def configure_tesseract():
+    """Point pytesseract at the discovered binary. Returns True if Tesseract is available."""
+    import pytesseract
+
+    cmd = find_tesseract()
+    if cmd is None:
+        return False
+    pytesseract.pytesseract.tesseract_cmd = cmd
+    return True
+
+
+def tesseract_health():
+    """
+    Check that the discovered Tesseract binary runs.
+
+    Returns:
+        dict: {"available": bool, "path": str or None, "version": str or None, "error": str or None}
+    """
+    cmd = find_tesseract()
+    if cmd is None:
+        return {"available": False, "path": None, "version": None, "error": "Tesseract not found"}
+    try:
+        out = subprocess.run([cmd, "--version"], capture_output=True, text=True, timeout=10)
+        first_line = (out.stdout or out.stderr).splitlines()[0] if (out.stdout or out.stderr) else ""
+        return {"available": out.returncode == 0, "path": cmd, "version": first_line or None, "error": None}
+    except Exception as e:
+        return {"available": False, "path": cmd, "version": None, "error": str(e)}
@@ -1,6 +1,41 @@
+import hashlib
 import json
+import math
 import os
 import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+ARTIFACT_DIR = os.getenv("COACH_ARTIFACT_DIR", os.path.join(os.getenv("COACH_CACHE_DIR", ".cache"), "artifacts"))
+# Session artifact folders untouched for longer than this are garbage-collected
+ARTIFACT_MAX_AGE_SECONDS = float(os.getenv("ARTIFACT_MAX_AGE", str(7 * 24 * 3600)))
+ARTIFACT_GC_INTERVAL_SECONDS = 3600
+
+_last_gc = 0.0
+
+
+def atomic_write_json(path, data):
+    """
+    Write JSON to a temporary file in the same folder, then rename it over `path`,
+    so readers never see a partially written file.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 
 def save_extracted_text_to_json(text, filename="temp_ocr_data.json"):
     """
@@ -12,54 +47,404 @@ def save_extracted_text_to_json(text, filename="temp_ocr_data.json"):
     """
     data = {"extracted_text": text}
     try:
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        atomic_write_json(filename, data)
         return True
     except Exception as e:
         print(f"Error saving to JSON: {e}")
         return False
 
+
+def text_sha256(text):
+    """Return the hex SHA-256 of a string (UTF-8)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def save_extraction_artifact(text, session_id, directory=ARTIFACT_DIR):
+    """
+    Save extracted text as a per-session artifact keyed on its content hash.
+
+    Nothing is written if the session already has an artifact for this exact text.
+    Older artifacts of the session are removed once the new one is in place.
+
+    Args:
+        text (str): The extracted text.
+        session_id (str): The user session the text belongs to.
+        directory (str): Root folder for artifacts.
+
+    Returns:
+        str: The SHA-256 of the text (the artifact key).
+    """
+    digest = text_sha256(text)
+    session_dir = os.path.join(directory, re.sub(r"[^A-Za-z0-9_-]", "_", session_id))
+    path = os.path.join(session_dir, f"{digest}.json")
+    if not os.path.exists(path):
+        atomic_write_json(path, {"sha256": digest, "extracted_text": text, "saved_at": time.time()})
+        for name in os.listdir(session_dir):
+            if name.endswith(".json") and name != f"{digest}.json":
+                os.remove(os.path.join(session_dir, name))
+        gc_artifacts(directory)
+    return digest
+
+
+def gc_artifacts(directory=ARTIFACT_DIR, max_age=ARTIFACT_MAX_AGE_SECONDS, force=False):
+    """
+    Delete session artifact folders not modified within `max_age` seconds.
+
+    Runs at most once per ARTIFACT_GC_INTERVAL_SECONDS per process unless forced.
+
+    Returns:
+        int: Number of session folders removed.
+    """
+    global _last_gc
+    now = time.time()
+    if not force and now - _last_gc < ARTIFACT_GC_INTERVAL_SECONDS:
+        return 0
+    _last_gc = now
+    if not os.path.isdir(directory):
+        return 0
+    removed = 0
+    for name in os.listdir(directory):
+        session_dir = os.path.join(directory, name)
+        try:
+            if os.path.isdir(session_dir) and now - os.path.getmtime(session_dir) > max_age:
+                shutil.rmtree(session_dir, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+# Line terminators recognised by str.splitlines()
+_LINE_RE = re.compile(r"[^\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]*(\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029])?")
+_LINE_BREAKS = "\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+_SENTENCE_END_RE = re.compile(r"[.!?\u2026]+[\"'\u201d\u2019)\]]*(?=\s|$)")
+_WORD_RE = re.compile(r"\S+")
+CHUNK_CACHE_SIZE = int(os.getenv("CHUNK_CACHE_SIZE", "128"))
+
+_chunk_cache = OrderedDict()
+_chunk_cache_lock = threading.Lock()
+
+
+def _iter_line_spans(text, start=0):
+    # (line start, content end, line end incl. terminator) for each line from `start`
+    for match in _LINE_RE.finditer(text, start):
+        if match.end() == match.start():
+            break
+        content_end = match.start(1) if match.group(1) else match.end()
+        yield match.start(), content_end, match.end()
+
+
+def _sentence_spans(text, start, end):
+    # Sentences within text[start:end], without surrounding whitespace
+    pos = start
+    for match in _SENTENCE_END_RE.finditer(text, start, end):
+        s = pos
+        while s < match.end() and text[s].isspace():
+            s += 1
+        if s < match.end():
+            yield s, match.end()
+        pos = match.end()
+    while pos < end and text[pos].isspace():
+        pos += 1
+    tail_end = end
+    while tail_end > pos and text[tail_end - 1].isspace():
+        tail_end -= 1
+    if pos < tail_end:
+        yield pos, tail_end
+
+
+def _split_long_line(text, start, end, max_words):
+    # Pack the sentences of an over-long line into pieces of at most max_words words;
+    # sentences longer than that are cut into max_words-word windows
+    piece_start = None
+    piece_end = start
+    count = 0
+    for s, e in _sentence_spans(text, start, end):
+        words = [m.span() for m in _WORD_RE.finditer(text, s, e)]
+        if len(words) > max_words:
+            if piece_start is not None:
+                yield piece_start, piece_end, count
+                piece_start = None
+            for i in range(0, len(words), max_words):
+                window = words[i:i + max_words]
+                yield window[0][0], window[-1][1], len(window)
+            continue
+        if piece_start is not None and count + len(words) > max_words:
+            yield piece_start, piece_end, count
+            piece_start = None
+        if piece_start is None:
+            piece_start, count = s, 0
+        piece_end = e
+        count += len(words)
+    if piece_start is not None:
+        yield piece_start, piece_end, count
+
+
+def _greedy_spans(text, start, max_words):
+    # Pack whole lines into chunks of at most max_words; a longer line is split at
+    # sentence boundaries (or, failing that, between words). Yields (start, end, words).
+    chunk_start = None
+    chunk_end = 0
+    count = 0
+    for line_start, content_end, _ in _iter_line_spans(text, start):
+        words = len(text[line_start:content_end].split())
+        if words > max_words:
+            if chunk_start is not None:
+                yield chunk_start, chunk_end, count
+            pieces = list(_split_long_line(text, line_start, content_end, max_words))
+            yield from pieces[:-1]
+            chunk_start, chunk_end, count = pieces[-1]
+            continue
+        if chunk_start is not None and count + words > max_words:
+            yield chunk_start, chunk_end, count
+            chunk_start = None
+        if chunk_start is None:
+            chunk_start, count = line_start, 0
+        chunk_end = content_end
+        count += words
+    if chunk_start is not None:
+        yield chunk_start, chunk_end, count
+
+
+def _merge_small(chunks, min_words, max_words):
+    # Merge neighbouring chunks when either is below min_words and together they still
+    # fit in max_words (e.g. a short chunk cut off by a split line, or a short last chunk)
+    current = None
+    for start, end, words in chunks:
+        if current and (current[2] < min_words or words < min_words) and current[2] + words <= max_words:
+            current = (current[0], end, current[2] + words)
+            continue
+        if current:
+            yield current[:2]
+        current = (start, end, words)
+    if current:
+        yield current[:2]
+
+
+def _cache_chunks(key, spans):
+    with _chunk_cache_lock:
+        _chunk_cache[key] = spans
+        _chunk_cache.move_to_end(key)
+        while len(_chunk_cache) > CHUNK_CACHE_SIZE:
+            _chunk_cache.popitem(last=False)
+
+
+def clear_chunk_cache():
+    """Drop all memoized chunk boundaries."""
+    with _chunk_cache_lock:
+        _chunk_cache.clear()
+
+
+def chunk_spans(text, min_words=100, max_words=150):
+    """
+    Chunk boundaries for chunk_text_meaningfully, as (start, end) character offsets.
+
+    Lines are packed into chunks of at most max_words words; a chunk below min_words is
+    merged with a neighbour when the two together stay within max_words.
+
+    Results are memoized on the text's SHA-256 and the chunking parameters, so
+    reruns with unchanged text do no chunking work.
+
+    Returns:
+        tuple: (start, end) pairs; text[start:end] is the chunk.
+    """
+    if not text:
+        return ()
+    key = (text_sha256(text), min_words, max_words)
+    with _chunk_cache_lock:
+        spans = _chunk_cache.get(key)
+        if spans is not None:
+            _chunk_cache.move_to_end(key)
+            return spans
+    spans = tuple(_merge_small(_greedy_spans(text, 0, max_words), min_words, max_words))
+    _cache_chunks(key, spans)
+    return spans
+
+
+def rechunk_spans(old_text, old_spans, new_text, min_words=100, max_words=150):
+    """
+    Incrementally update chunk boundaries after an edit.
+
+    Chunks before the edited region are kept, chunking restarts at the first chunk the
+    edit can affect, and stops as soon as a boundary lines up with an old boundary in
+    the unchanged tail, whose chunks are reused with shifted offsets.
+
+    Args:
+        old_text (str): Text the old spans were computed for.
+        old_spans (sequence): chunk_spans(old_text, min_words, max_words).
+        new_text (str): The edited text.
+
+    Returns:
+        tuple: (start, end) pairs for new_text, identical to chunk_spans(new_text, ...).
+    """
+    if not old_spans or not new_text:
+        return chunk_spans(new_text, min_words, max_words)
+
+    limit = min(len(old_text), len(new_text))
+    prefix = 0
+    while prefix < limit and old_text[prefix] == new_text[prefix]:
+        prefix += 1
+    if prefix == len(old_text) == len(new_text):
+        return tuple(old_spans)
+    suffix = 0
+    while suffix < limit - prefix and old_text[-1 - suffix] == new_text[-1 - suffix]:
+        suffix += 1
+    delta = len(new_text) - len(old_text)
+    tail_start = len(new_text) - suffix
+
+    # A chunk's end depends on the line after it, so keep only chunks whose successor
+    # starts before the line containing the first change
+    edit_line = old_text.rfind("\n", 0, prefix) + 1
+    keep = 0
+    while keep + 1 < len(old_spans) and old_spans[keep + 1][0] < edit_line:
+        keep += 1
+    # Restart at the beginning of a line, dropping chunks that reach into that line
+    # (pieces of a split line, or a chunk merged with one)
+    restart = old_text.rfind("\n", 0, old_spans[keep][0]) + 1
+    while keep and old_spans[keep - 1][1] > restart:
+        keep -= 1
+        restart = old_text.rfind("\n", 0, old_spans[keep][0]) + 1
+    spans = list(old_spans[:keep])
+
+    old_starts = {start: index for index, (start, _) in enumerate(old_spans)}
+    for span in _merge_small(_greedy_spans(new_text, restart, max_words), min_words, max_words):
+        start = span[0]
+        # Resync only at line starts: pieces of a split line depend on the whole line
+        if (spans and start >= tail_start and start - delta in old_starts
+                and new_text[start - 1] in _LINE_BREAKS and old_text[start - delta - 1] in _LINE_BREAKS):
+            index = old_starts[start - delta]
+            spans.extend((s + delta, e + delta) for s, e in old_spans[index:])
+            break
+        spans.append(span)
+
+    spans = tuple(spans)
+    _cache_chunks((text_sha256(new_text), min_words, max_words), spans)
+    return spans
+
+
 def chunk_text_meaningfully(text, min_words=100, max_words=150):
     """
     Chunks text into meaningful segments based on word count, preserving line breaks.
     
     Args:
         text (str): The input text.
-        min_words (int): Minimum words per chunk (soft target).
-        max_words (int): Target maximum words per chunk.
+        min_words (int): Minimum words per chunk (soft target: a shorter chunk is merged
+            with a neighbour when that stays within max_words).
+        max_words (int): Maximum words per chunk.
         
     Returns:
         list: A list of text chunks.
     """
+    return [text[start:end] for start, end in chunk_spans(text, min_words, max_words)]
+
+
+# ---------------- TOKEN-AWARE CHUNKING ----------------
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+# Markdown headings, short ALL-CAPS lines and short "Title:" lines
+_HEADING_RE = re.compile(r"#{1,6}\s+\S.*|[A-Z][A-Z0-9 &/,()'-]{2,60}:?|[A-Z][\w &/,()'-]{0,60}:")
+
+TextChunk = namedtuple("TextChunk", ["start", "end", "tokens"])
+CHUNK_MODES = ("sentence", "heading", "token")
+
+
+def count_tokens(text):
+    """
+    Approximate the BPE token count of a string.
+
+    Each punctuation mark counts as one token and each word as one token per four
+    characters, which tracks Llama-family tokenizers closely enough for budgeting.
+    """
     if not text:
+        return 0
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _TOKEN_RE.findall(text))
+
+
+def _units(text, mode):
+    # (start, end, starts_section) for each unit: a sentence, or a word in token mode
+    if mode == "token":
+        for match in _WORD_RE.finditer(text):
+            yield match.start(), match.end(), False
+        return
+    for line_start, content_end, _ in _iter_line_spans(text):
+        heading = mode == "heading" and _HEADING_RE.fullmatch(text, line_start, content_end) is not None
+        if heading:
+            s, e = line_start, content_end
+            while s < e and text[s].isspace():
+                s += 1
+            if s < e:
+                yield s, e, True
+            continue
+        for s, e in _sentence_spans(text, line_start, content_end):
+            yield s, e, False
+
+
+def _sized_units(text, mode, hard_max):
+    # Units with token costs; a unit over hard_max is broken into words, and a single
+    # word over hard_max into character windows
+    for s, e, section in _units(text, mode):
+        tokens = count_tokens(text[s:e])
+        if tokens <= hard_max:
+            yield s, e, tokens, section
+            continue
+        for match in _WORD_RE.finditer(text, s, e):
+            ws, we = match.span()
+            word_tokens = count_tokens(text[ws:we])
+            if word_tokens <= hard_max:
+                yield ws, we, word_tokens, section
+            else:
+                step = hard_max * 4
+                for cs in range(ws, we, step):
+                    yield cs, min(we, cs + step), count_tokens(text[cs:min(we, cs + step)]), section
+            section = False
+
+
+def chunk_document(text, max_tokens=800, mode="sentence", overlap_tokens=0, hard_max_tokens=None, min_tokens=0):
+    """
+    Split text into chunks that fit an LLM token budget.
+
+    Sentences (or, in "token" mode, words) are packed greedily up to max_tokens.
+    "heading" mode also starts a new chunk at each section heading once the current
+    chunk holds at least min_tokens. Runs in time linear in len(text).
+
+    Args:
+        text (str): The input text.
+        max_tokens (int): Target tokens per chunk.
+        mode (str): "sentence", "heading" or "token".
+        overlap_tokens (int): Tokens of trailing context repeated at the start of the next chunk.
+        hard_max_tokens (int): Absolute cap per chunk (default max_tokens). Sentences over
+            max_tokens but within the cap are kept whole; longer ones are split between words.
+        min_tokens (int): A final chunk smaller than this is merged into the previous one
+            when the cap allows.
+
+    Returns:
+        list: TextChunk(start, end, tokens) entries; text[start:end] is the chunk.
+    """
+    if mode not in CHUNK_MODES:
+        raise ValueError(f"Unknown chunk mode {mode!r}; expected one of {CHUNK_MODES}")
+    hard_max = max(hard_max_tokens or max_tokens, max_tokens)
+    units = list(_sized_units(text, mode, hard_max))
+    if not units:
         return []
-        
-    # Split text into lines to preserve original structure/alignment
-    lines = text.splitlines()
-    
+
     chunks = []
-    current_chunk = []
-    current_word_count = 0
-    
-    for line in lines:
-        # Preserve empty lines as structural spacers within a chunk if possible,
-        # or they just get added.
-        word_count = len(line.split())
-        
-        # If adding this line exceeds the max limit:
-        # 1. Close current chunk (if it has content).
-        # 2. Start new chunk with this line.
-        if current_chunk and (current_word_count + word_count > max_words):
-             chunks.append("\n".join(current_chunk))
-             current_chunk = [line]
-             current_word_count = word_count
-        else:
-             # Add line to current chunk
-             current_chunk.append(line)
-             current_word_count += word_count
-            
-    # Add any remaining text
-    if current_chunk:
-        chunks.append("\n".join(current_chunk))
-        
+    first = 0  # index of the first unit in the current chunk
+    tokens = 0
+    for index, (_, _, unit_tokens, section) in enumerate(units):
+        if index > first and (tokens + unit_tokens > max_tokens or (section and tokens >= min_tokens)):
+            chunks.append(TextChunk(units[first][0], units[index - 1][1], tokens))
+            # Repeat trailing units as overlap, but never the whole previous chunk
+            previous_first = first
+            first, tokens = index, 0
+            if overlap_tokens and not section:
+                while (first - 1 > previous_first
+                       and tokens + units[first - 1][2] <= overlap_tokens
+                       and tokens + units[first - 1][2] + unit_tokens <= max_tokens):
+                    first -= 1
+                    tokens += units[first][2]
+        tokens += unit_tokens
+    chunks.append(TextChunk(units[first][0], units[-1][1], tokens))
+
+    if len(chunks) > 1 and chunks[-1].tokens < min_tokens:
+        last, previous = chunks[-1], chunks[-2]
+        if overlap_tokens == 0 and previous.tokens + last.tokens <= hard_max:
+            chunks[-2:] = [TextChunk(previous.start, last.end, previous.tokens + last.tokens)]
     return chunks
@@ -0,0 +1,206 @@
+"""
+Vision OCR over Groq with model fallback, optional hedging and per-model circuit breakers.
+
+Candidate models are tried in preference order. In hedged mode, if the current model
+has not answered within OCR_HEDGE_AFTER seconds, the next candidate is started as well
+and the first successful answer wins. A model that fails OCR_BREAKER_FAILURES times in
+a row is skipped for OCR_BREAKER_COOLDOWN seconds. Latency and error counts are kept
+per model.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from llm_cache import cached_completion, get_cache, make_cache_key
+
+logger = logging.getLogger("coach.vision_ocr")
+
+# Candidate models in order of preference (using exact IDs from user's access list)
+VISION_MODELS = [
+    "meta-llama/llama-4-scout-17b-16e-instruct",
+    "meta-llama/llama-4-maverick-17b-128e-instruct",
+    "llama-3.2-11b-vision-preview",  # Keeping as fallback just in case
+]
+
+# Request options for every OCR call (also part of the cache key)
+OCR_OPTIONS = {"temperature": 0.0, "max_tokens": 2048}
+
+OCR_PROMPT = "Extract all the text from this Job Description image exactly as it appears. Output ONLY the text content, no conversational filler."
+
+# Seconds to wait on a model before hedging to the next one (0 disables hedging)
+OCR_HEDGE_AFTER = float(os.getenv("OCR_HEDGE_AFTER", "0"))
+OCR_BREAKER_FAILURES = int(os.getenv("OCR_BREAKER_FAILURES", "2"))
+OCR_BREAKER_COOLDOWN = float(os.getenv("OCR_BREAKER_COOLDOWN", "60"))
+
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="vision-hedge")
+
+
+class ModelHealth:
+    """Latency/error statistics and circuit-breaker state for one model."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.total_latency = 0.0
+        self.last_latency = None
+        self.last_error = None
+        self.open_until = 0.0
+
+    def is_open(self, now=None):
+        return (now or time.time()) < self.open_until
+
+    def as_dict(self):
+        successes = self.calls - self.errors
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_latency": (self.total_latency / successes) if successes else None,
+            "last_latency": self.last_latency,
+            "last_error": self.last_error,
+            "circuit_open": self.is_open(),
+        }
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def _get_health(model):
+    with _health_lock:
+        if model not in _health:
+            _health[model] = ModelHealth()
+        return _health[model]
+
+
+def record_success(model, latency):
+    health = _get_health(model)
+    with _health_lock:
+        health.calls += 1
+        health.consecutive_failures = 0
+        health.total_latency += latency
+        health.last_latency = latency
+        health.open_until = 0.0
+
+
+def record_failure(model, error):
+    health = _get_health(model)
+    with _health_lock:
+        health.calls += 1
+        health.errors += 1
+        health.consecutive_failures += 1
+        health.last_error = str(error)[:200]
+        if health.consecutive_failures >= OCR_BREAKER_FAILURES:
+            health.open_until = time.time() + OCR_BREAKER_COOLDOWN
+            logger.warning("Circuit opened for %s for %.0fs after %d failures",
+                           model, OCR_BREAKER_COOLDOWN, health.consecutive_failures)
+
+
+def model_stats():
+    """Return per-model latency, error and circuit-breaker state."""
+    with _health_lock:
+        return {model: health.as_dict() for model, health in _health.items()}
+
+
+def available_models(models=None):
+    """Return candidates whose circuit is closed, in preference order (all of them if every circuit is open)."""
+    models = models or VISION_MODELS
+    now = time.time()
+    closed = [m for m in models if not _get_health(m).is_open(now)]
+    return closed or list(models)
+
+
+def _ocr_messages(base64_image, mime):
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": OCR_PROMPT},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:{mime};base64,{base64_image}"
+                    }
+                }
+            ]
+        }
+    ]
+
+
+def _call_model(client, model, messages):
+    # A cache hit says nothing about the model, so only real requests are timed
+    cached = get_cache().get(make_cache_key(model, messages, **OCR_OPTIONS))
+    if cached is not None:
+        return cached
+    start = time.perf_counter()
+    try:
+        text = cached_completion(client, model=model, messages=messages, **OCR_OPTIONS)
+    except Exception as e:
+        record_failure(model, e)
+        raise
+    record_success(model, time.perf_counter() - start)
+    return text
+
+
+def _sequential(client, models, messages):
+    last_exception = None
+    for model in models:
+        try:
+            return _call_model(client, model, messages)
+        except Exception as e:
+            last_exception = e
+            continue  # Try next model
+    raise last_exception
+
+
+def _hedged(client, models, messages, hedge_after):
+    queue = list(models)
+    pending = {}
+    last_exception = None
+
+    def launch():
+        model = queue.pop(0)
+        pending[_hedge_pool.submit(_call_model, client, model, messages)] = model
+
+    launch()
+    while pending:
+        done, _ = wait(pending, timeout=hedge_after if queue else None, return_when=FIRST_COMPLETED)
+        if not done:
+            logger.info("No answer from %s after %.1fs; hedging to %s", list(pending.values()), hedge_after, queue[0])
+            launch()
+            continue
+        for future in done:
+            pending.pop(future)
+            try:
+                # Slower requests keep running; their results still land in the cache
+                return future.result()
+            except Exception as e:
+                last_exception = e
+        if queue:
+            launch()
+    raise last_exception
+
+
+def extract_text(client, base64_image, mime="image/jpeg", hedge_after=None):
+    """
+    OCR a base64-encoded image with the vision models.
+
+    Args:
+        client (Groq): The Groq client.
+        base64_image (str): Base64 image payload.
+        mime (str): The payload's MIME type.
+        hedge_after (float): Seconds before hedging to the next model. Defaults to
+            OCR_HEDGE_AFTER; 0 or None means strictly sequential fallback.
+
+    Returns:
+        str: The extracted text.
+    """
+    if hedge_after is None:
+        hedge_after = OCR_HEDGE_AFTER
+    models = available_models()
+    messages = _ocr_messages(base64_image, mime)
+    if hedge_after and hedge_after > 0 and len(models) > 1:
+        return _hedged(client, models, messages, hedge_after)
+    return _sequential(client, models, messages)